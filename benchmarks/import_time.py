@@ -0,0 +1,59 @@
+"""
+Import-time benchmark of the integration
+
+Imports the integration (as Home Assistant does at boot and when a config
+flow is opened) in fresh interpreters and compares it with the cost of
+importing python-miio, which is now deferred until a device is set up.
+
+    python benchmarks/import_time.py [runs]
+"""
+
+import statistics
+import subprocess
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+
+SNIPPET = """
+import sys, time
+{preload}
+start = time.perf_counter()
+import {module}
+print(time.perf_counter() - start, "miio" in sys.modules)
+"""
+
+# Home Assistant core is already loaded when the integration is imported.
+PRELOAD = "import homeassistant.components.climate, homeassistant.helpers.update_coordinator"
+
+
+def measure(module, runs, preload=PRELOAD):
+    timings = []
+    loaded = False
+    for _ in range(runs):
+        out = subprocess.run(
+            [sys.executable, "-c", SNIPPET.format(preload=preload, module=module)],
+            cwd=ROOT,
+            check=True,
+            capture_output=True,
+            text=True,
+        ).stdout.split()
+        timings.append(float(out[0]))
+        loaded = out[1] == "True"
+    return statistics.median(timings), loaded
+
+
+def main():
+    runs = int(sys.argv[1]) if len(sys.argv) > 1 else 10
+    for module in [
+        "custom_components.xiaomi_miot_air_conditioner.config_flow",
+        "custom_components.xiaomi_miot_air_conditioner.climate",
+        "custom_components.xiaomi_miot_air_conditioner.switch",
+        "miio",
+    ]:
+        seconds, loaded = measure(module, runs)
+        print(f"{module:60} {seconds * 1000:8.1f} ms  miio loaded: {loaded}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,103 @@
+"""
+Packet encoding benchmark of a status poll
+
+Encodes the requests of one status poll and decodes the replies, as
+python-miio does on every message and with the per-device protocol
+context the integration now uses, and checks both produce the same bytes.
+
+    python benchmarks/protocol.py [polls]
+"""
+
+import calendar
+import datetime
+import sys
+import timeit
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from miio.airconditioner_miot import AirConditionerMiot  # noqa: E402
+from miio.protocol import Message  # noqa: E402
+
+from custom_components.xiaomi_miot_air_conditioner.miot import (  # noqa: E402
+    status_requests,
+)
+from custom_components.xiaomi_miot_air_conditioner.protocol import (  # noqa: E402
+    ProtocolContext,
+)
+
+TOKEN = bytes.fromhex("00112233445566778899aabbccddeeff")
+DEVICE_ID = bytes.fromhex("0a1b2c3d")
+TS = datetime.datetime(2024, 1, 1)
+
+
+def build(token, request_id, command, parameters):
+    """Build a packet with python-miio."""
+    header = {"length": 0, "unknown": 0, "device_id": DEVICE_ID, "ts": TS}
+    request = {"id": request_id, "method": command, "params": parameters}
+    return Message.build(
+        {"data": {"value": request}, "header": {"value": header}, "checksum": 0},
+        token=token,
+    )
+
+
+def replies(token, requests):
+    """Build the replies of a poll, as a device would send them."""
+    packets = []
+    for request_id, request in enumerate(requests, 1):
+        result = [{**item, "code": 0, "value": 1} for item in request]
+        header = {"length": 0, "unknown": 0, "device_id": DEVICE_ID, "ts": TS}
+        packets.append(
+            Message.build(
+                {
+                    "data": {"value": {"id": request_id, "result": result}},
+                    "header": {"value": header},
+                    "checksum": 0,
+                },
+                token=token,
+            )
+        )
+    return packets
+
+
+def poll_miio(requests, packets):
+    for request_id, request in enumerate(requests, 1):
+        build(TOKEN, request_id, "get_properties", request)
+    for packet in packets:
+        Message.parse(packet, token=TOKEN).data.value
+
+
+def poll_context(context, requests, packets):
+    ts = calendar.timegm(TS.timetuple())
+    for request_id, request in enumerate(requests, 1):
+        context.encode(
+            context.payload(request_id, "get_properties", request), DEVICE_ID, ts
+        )
+    for packet in packets:
+        context.verify(packet) and context.decode(packet)
+
+
+def main():
+    polls = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    requests = status_requests(AirConditionerMiot("127.0.0.1", TOKEN.hex()))
+    packets = replies(TOKEN, requests)
+    context = ProtocolContext(TOKEN)
+
+    ts = calendar.timegm(TS.timetuple())
+    for request_id, request in enumerate(requests, 1):
+        assert context.encode(
+            context.payload(request_id, "get_properties", request), DEVICE_ID, ts
+        ) == build(TOKEN, request_id, "get_properties", request)
+    for packet in packets:
+        assert context.decode(packet) == Message.parse(packet, token=TOKEN).data.value
+
+    print(f"{len(requests)} requests per poll, {polls} polls")
+    before = timeit.timeit(lambda: poll_miio(requests, packets), number=polls)
+    after = timeit.timeit(lambda: poll_context(context, requests, packets), number=polls)
+    for label, seconds in [("python-miio", before), ("protocol context", after)]:
+        print(f"{label:20} {seconds / polls * 1e6:8.1f} us per poll")
+    print(f"{'speedup':20} {before / after:8.1f}x")
+
+
+if __name__ == "__main__":
+    main()
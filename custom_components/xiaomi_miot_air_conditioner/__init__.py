@@ -2,42 +2,140 @@
 Support for Xiaomi Air Conditioner Miot Version
 """
 
+import asyncio
 import logging
 from datetime import timedelta
 
+import homeassistant.helpers.config_validation as cv
+import voluptuous as vol
 from homeassistant import config_entries
-from homeassistant.const import CONF_HOST, CONF_NAME, CONF_TOKEN
+from homeassistant.components.climate.const import (
+    HVAC_MODE_COOL,
+    HVAC_MODE_DRY,
+    HVAC_MODE_FAN_ONLY,
+    HVAC_MODE_HEAT,
+    HVAC_MODE_OFF,
+)
+from homeassistant.const import (
+    CONF_ENTITIES,
+    CONF_HOST,
+    CONF_NAME,
+    CONF_TOKEN,
+    EVENT_HOMEASSISTANT_STOP,
+    WEEKDAYS,
+)
 from homeassistant.core import HomeAssistant
-from homeassistant.exceptions import PlatformNotReady
+from homeassistant.helpers import discovery
+from homeassistant.helpers.dispatcher import async_dispatcher_send
 from homeassistant.helpers.entity_component import EntityComponent
-from miio import Device
-from miio.airconditioner_miot import AirConditionerMiot
 
+from .command_queue import CommandQueue
 from .const import (
+    ATTR_TEMPERATURE,
+    CONF_AT,
+    CONF_DAYS,
+    CONF_EXTERNAL_SENSOR,
+    CONF_HVAC_MODE,
+    CONF_HYSTERESIS,
+    CONF_MIN_DWELL,
+    CONF_PROGRAM,
     CONF_RETRIES,
+    CONF_SCHEDULES,
+    CONF_WORKERS,
+    CONF_ZONES,
+    DATA_SCHEDULE,
+    DATA_WORKERS,
     DOMAIN,
     MIOT_DEVICE_OFFLINE,
     MIOT_DEVICE_OK,
     MIOT_UNSUPPORTED_DEVICE,
     MODELS_SUPPORTED,
+    SIGNAL_DEVICE_UPDATED,
 )
+from .control import DEFAULT_HYSTERESIS, DEFAULT_MIN_DWELL
+from .coordinator import AirConditionerMiotCoordinator
+from .miot import MiotTransport, async_import_miio
+from .schedule import ScheduleEngine
+from .services import async_setup_services
+from .websocket import async_setup_websocket
+from .worker import WorkerPool, WorkerTransport
 
 _LOGGER = logging.getLogger(__name__)
 
 
 SUPPORTED_DOMAINS = [
     "climate",
+    "sensor",
     "switch",
 ]
 
 SCAN_INTERVAL = timedelta(seconds=60)
 
+# A zone groups several configured air conditioners (by their climate
+# entity ids) behind one virtual climate entity.
+ZONE_SCHEMA = vol.Schema(
+    {
+        vol.Required(CONF_NAME): cv.string,
+        vol.Required(CONF_ENTITIES): cv.entity_ids,
+    }
+)
 
-async def check_miot_device(host, token):
+# A schedule is a weekly program of transitions shared by several units.
+PROGRAM_STEP_SCHEMA = vol.Schema(
+    {
+        vol.Optional(CONF_DAYS, default=WEEKDAYS): cv.weekdays,
+        vol.Required(CONF_AT): cv.time,
+        vol.Required(CONF_HVAC_MODE): vol.In(
+            [
+                HVAC_MODE_COOL,
+                HVAC_MODE_DRY,
+                HVAC_MODE_FAN_ONLY,
+                HVAC_MODE_HEAT,
+                HVAC_MODE_OFF,
+            ]
+        ),
+        vol.Optional(ATTR_TEMPERATURE): vol.All(
+            vol.Coerce(float), vol.Range(min=16, max=31)
+        ),
+    }
+)
+
+SCHEDULE_SCHEMA = vol.Schema(
+    {
+        vol.Required(CONF_NAME): cv.string,
+        vol.Required(CONF_ENTITIES): cv.entity_ids,
+        vol.Required(CONF_PROGRAM): vol.All(cv.ensure_list, [PROGRAM_STEP_SCHEMA]),
+    }
+)
+
+CONFIG_SCHEMA = vol.Schema(
+    {
+        DOMAIN: vol.Schema(
+            {
+                vol.Optional(CONF_ZONES, default=[]): vol.All(
+                    cv.ensure_list, [ZONE_SCHEMA]
+                ),
+                vol.Optional(CONF_SCHEDULES, default=[]): vol.All(
+                    cv.ensure_list, [SCHEDULE_SCHEMA]
+                ),
+                # Worker processes doing the device I/O, 0 to keep it
+                # in the Home Assistant process.
+                vol.Optional(CONF_WORKERS, default=0): vol.All(
+                    vol.Coerce(int), vol.Range(min=0, max=16)
+                ),
+            }
+        )
+    },
+    extra=vol.ALLOW_EXTRA,
+)
+
+
+async def check_miot_device(hass, host, token):
     ret = {}
     try:
-        miio_device = Device(host, token)
-        device_info = miio_device.info()
+        miio = await async_import_miio(hass)
+        miio_device = miio.Device(host, token)
+        device_info = await MiotTransport(hass, miio_device).async_info()
         model = device_info.model
         unique_id = f"{model}-{device_info.mac_address}"
         _LOGGER.info(
@@ -68,10 +166,26 @@ async def async_setup(hass, hass_config):
     hass.data.setdefault(DOMAIN, {})
     config = hass_config.get(DOMAIN) or {}
     hass.data[DOMAIN]["config"] = config
+    hass.data[DOMAIN][DATA_SCHEDULE] = ScheduleEngine(
+        hass, config.get(CONF_SCHEDULES, [])
+    )
+
+    if config.get(CONF_WORKERS):
+        pool = WorkerPool(hass, config[CONF_WORKERS])
+        hass.data[DOMAIN][DATA_WORKERS] = pool
+        hass.bus.async_listen_once(EVENT_HOMEASSISTANT_STOP, pool.async_stop)
 
     component = EntityComponent(_LOGGER, DOMAIN, hass, SCAN_INTERVAL)
     await component.async_setup(config)
 
+    async_setup_services(hass)
+    async_setup_websocket(hass)
+
+    for zone in config.get(CONF_ZONES, []):
+        hass.async_create_task(
+            discovery.async_load_platform(hass, "climate", DOMAIN, zone, hass_config)
+        )
+
     return True
 
 
@@ -83,11 +197,12 @@ async def async_setup_entry(
     entry_id = config_entry.entry_id
     unique_id = config_entry.unique_id
 
-    config = dict(config_entry.data)
+    config = {**config_entry.data, **config_entry.options}
     host = config.get(CONF_HOST)
     token = config.get(CONF_TOKEN)
     name = config.get(CONF_NAME)
     retries = config.get(CONF_RETRIES)
+    external_sensor = config.get(CONF_EXTERNAL_SENSOR) or None
 
     _LOGGER.debug(
         "Xiaomi Miot air conditioner config entry: %s",
@@ -98,24 +213,37 @@ async def async_setup_entry(
         },
     )
 
-    ret = await check_miot_device(host, token)
-    if ret["code"] != MIOT_DEVICE_OK:
-        if ret["code"] == MIOT_DEVICE_OFFLINE:
-            raise PlatformNotReady
-        else:
-            _LOGGER.error(ret["err"])
-        return False
-
     hass.data.setdefault(DOMAIN, {})
 
+    # Nothing here talks to the device: entities are added unavailable and
+    # the first probe and status read run in the background, so entries of
+    # offline units neither block nor delay Home Assistant startup.
+    miio = await async_import_miio(hass)
+    from .protocol import use_fast_protocol
+
+    # The cipher state of the device is derived from its token only once.
+    miot_device = use_fast_protocol(miio.AirConditionerMiot(host, token))
+    pool = hass.data[DOMAIN].get(DATA_WORKERS)
+    if pool is not None:
+        transport = WorkerTransport(hass, miot_device, pool, host, token)
+    else:
+        transport = MiotTransport(hass, miot_device)
+    coordinator = AirConditionerMiotCoordinator(
+        hass, entry_id, name, transport, retries, unique_id
+    )
     info = {
-        "miot_device": AirConditionerMiot(host, token),
+        "miot_device": miot_device,
+        "transport": transport,
+        "command_queue": CommandQueue(hass, transport),
+        "coordinator": coordinator,
         "host": host,
         "token": token,
         "name": name,
         "retries": retries,
         "unique_id": unique_id,
-        "device_info": ret["device_info"],
+        "external_sensor": external_sensor,
+        "hysteresis": config.get(CONF_HYSTERESIS, DEFAULT_HYSTERESIS),
+        "min_dwell": config.get(CONF_MIN_DWELL, DEFAULT_MIN_DWELL),
     }
 
     hass.data[DOMAIN][entry_id] = info
@@ -127,4 +255,45 @@ async def async_setup_entry(
             hass.config_entries.async_forward_entry_setup(config_entry, sd)
         )
 
+    info["first_refresh"] = hass.async_create_task(coordinator.async_refresh())
+
+    config_entry.async_on_unload(config_entry.add_update_listener(async_reload_entry))
+    config_entry.async_on_unload(
+        coordinator.async_add_listener(coordinator.async_notify_changed)
+    )
+
+    return True
+
+
+async def async_unload_entry(
+    hass: HomeAssistant, config_entry: config_entries.ConfigEntry
+):
+    """ Unload platforms and release everything held for the device. """
+    unloaded = all(
+        await asyncio.gather(
+            *[
+                hass.config_entries.async_forward_entry_unload(config_entry, sd)
+                for sd in SUPPORTED_DOMAINS
+            ]
+        )
+    )
+    if not unloaded:
+        return False
+
+    info = hass.data[DOMAIN].pop(config_entry.entry_id)
+    info["first_refresh"].cancel()
+    await info["coordinator"].async_shutdown()
+    info["command_queue"].async_cancel()
+    pool = hass.data[DOMAIN].get(DATA_WORKERS)
+    if pool is not None:
+        pool.async_evict(info["host"], info["token"])
+    async_dispatcher_send(hass, SIGNAL_DEVICE_UPDATED, config_entry.entry_id)
+
     return True
+
+
+async def async_reload_entry(
+    hass: HomeAssistant, config_entry: config_entries.ConfigEntry
+):
+    """ Reload the entry after its options changed. """
+    await hass.config_entries.async_reload(config_entry.entry_id)
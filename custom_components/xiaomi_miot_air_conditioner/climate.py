@@ -4,14 +4,17 @@ Support for Xiaomi Air Conditioner Miot Version
 
 import asyncio
 import logging
+from collections import Counter
 from enum import Enum
-from functools import partial
 
 import homeassistant.helpers.config_validation as cv
 import voluptuous as vol
 from homeassistant.components.climate import ClimateEntity
 from homeassistant.components.climate.const import DOMAIN as CLIMATE_DOMAIN
 from homeassistant.components.climate.const import (
+    ATTR_FAN_MODE,
+    ATTR_HVAC_MODE,
+    ATTR_SWING_MODE,
     HVAC_MODE_COOL,
     HVAC_MODE_DRY,
     HVAC_MODE_FAN_ONLY,
@@ -24,22 +27,46 @@ from homeassistant.components.climate.const import (
     SWING_OFF,
     SWING_VERTICAL,
 )
-from homeassistant.const import ATTR_ENTITY_ID, TEMP_CELSIUS
-from miio import DeviceException
-from miio.airconditioner_miot import FanSpeed, OperationMode
+from homeassistant.const import (
+    ATTR_ENTITY_ID,
+    CONF_ENTITIES,
+    CONF_NAME,
+    STATE_UNAVAILABLE,
+    STATE_UNKNOWN,
+    TEMP_CELSIUS,
+)
+from homeassistant.core import callback
+from homeassistant.helpers import entity_registry as er
+from homeassistant.helpers.event import async_track_state_change_event
+from homeassistant.helpers.restore_state import RestoreEntity
+from homeassistant.helpers.update_coordinator import CoordinatorEntity
 
 from .const import (
     ATTR_CURRENT_TEMPERATURE,
+    ATTR_DEVICE_TEMPERATURE,
+    ATTR_DUTY_CYCLE,
+    ATTR_FAILED,
     ATTR_FAN_SPEED,
     ATTR_FAN_SPEED_PERCENT,
     ATTR_HEATER,
+    ATTR_MEMBERS,
     ATTR_MODE,
+    ATTR_STALE,
+    ATTR_SUCCEEDED,
     ATTR_TARGET_TEMPERATURE,
     ATTR_TEMPERATURE,
+    ATTR_TEMPERATURE_TREND,
+    ATTR_TIME_IN_MODE,
     ATTR_TIMER_MINUTES,
     ATTR_VERTICAL_SWING,
+    DATA_SCHEDULE,
     DOMAIN,
+    TIMER_MAX_MINUTES,
+    FanSpeed,
+    OperationMode,
 )
+from .control import SetpointController
+from .miot import async_fan_out
 
 _LOGGER = logging.getLogger(__name__)
 
@@ -96,8 +123,6 @@ SERVICE_SET_DELAY_ON_TIMER = "miot_ac_set_delay_on_timer"
 SERVICE_SET_DELAY_OFF_TIMER = "miot_ac_set_delay_off_timer"
 SERVICE_CANCEL_TIMER = "miot_ac_cancel_timer"
 
-SUCCESS = ["ok"]
-
 AIRCONDITIONERMIOT_SERVICE_SCHEMA = vol.Schema(
     {vol.Optional(ATTR_ENTITY_ID): cv.entity_ids}
 )
@@ -113,7 +138,7 @@ SERVICE_SCHEMA_FAN_SPEED_PERCENT = AIRCONDITIONERMIOT_SERVICE_SCHEMA.extend(
 SERVICE_SCHEMA_TIMER = AIRCONDITIONERMIOT_SERVICE_SCHEMA.extend(
     {
         vol.Required(ATTR_TIMER_MINUTES): vol.All(
-            vol.Coerce(int), vol.Clamp(min=0, max=720)
+            vol.Coerce(int), vol.Clamp(min=0, max=TIMER_MAX_MINUTES)
         )
     }
 )
@@ -158,19 +183,67 @@ MODES_TO_MIIO = {
 
 MODES_TO_HASS = {v.value: k for k, v in MODES_TO_MIIO.items()}
 
+# Key-Value reference for miio property -> state_attr, used to apply the
+# result of a batched write to the cached state without polling again.
+PROPERTIES_TO_ATTRIBUTES = {
+    "fan_speed": [ATTR_FAN_SPEED],
+    "fan_speed_percent": [ATTR_FAN_SPEED_PERCENT],
+    "heater": [ATTR_HEATER],
+    "mode": [ATTR_MODE],
+    "target_temperature": [ATTR_TARGET_TEMPERATURE, ATTR_TEMPERATURE],
+    "vertical_swing": [ATTR_VERTICAL_SWING],
+}
+
+
+def _configured_entities(hass):
+    """Return the climate entities of all set up config entries."""
+    return [
+        config["entity"]
+        for config in hass.data.get(DOMAIN, {}).values()
+        if isinstance(config, dict) and "entity" in config
+    ]
+
+
+def _timer_value(minutes, delay_on):
+    """Encode a timer the way `AirConditionerMiot.set_timer` does."""
+    return ",".join(["1", str(minutes), str(int(delay_on))])
+
+
+def _round_temperature(temperature):
+    """Round a temperature to the 0.5 degree step and range of the device."""
+    temperature = min(max(temperature, DEFAULT_MIN_TEMP), DEFAULT_MAX_TEMP)
+    t_float = temperature - int(temperature)
+    if t_float < 0.25:
+        return int(temperature)
+    if t_float < 0.75:
+        return int(temperature) + 0.5
+    return int(temperature) + 1
+
 
 async def async_setup_entry(hass, config_entry, async_add_entities):
     """ Setup one climate entity with config entry forwarded. """
     entry_id = config_entry.entry_id
     config = hass.data[DOMAIN][entry_id]
-    device = config["miot_device"]
+    queue = config["command_queue"]
+    coordinator = config["coordinator"]
     name = config["name"]
-    retries = config["retries"]
     uniq_id = config["unique_id"]
-    device_info = config['device_info']
 
-    entity = XiaomiClimateEntity(name, device, retries, uniq_id, device_info)
-    async_add_entities([entity], update_before_add=True)
+    external_sensor = config["external_sensor"]
+    controller = None
+    if external_sensor is not None:
+        controller = SetpointController(
+            DEFAULT_TEMP_STEP,
+            DEFAULT_MIN_TEMP,
+            DEFAULT_MAX_TEMP,
+            config["hysteresis"],
+            config["min_dwell"],
+        )
+
+    entity = XiaomiClimateEntity(
+        coordinator, name, queue, uniq_id, external_sensor, controller
+    )
+    async_add_entities([entity])
 
     # Storage devices info to hass, for later device-specified service invoking.
     config["entity"] = entity
@@ -186,25 +259,25 @@ async def async_setup_entry(hass, config_entry, async_add_entities):
         # If entity_ids included in service.data,
         # only invoke service to specified devices.
         if entity_ids:
-            devices = [
-                device
-                for device in hass.data[DOMAIN].values()
-                if device["entity"].entity_id in entity_ids
+            entities = [
+                entity
+                for entity in _configured_entities(hass)
+                if entity.entity_id in entity_ids
             ]
         # If entity_ids not mentioned in service.data,
         # then invokoe service to all registered devices.
         else:
-            devices = hass.data[DOMAIN].values()
+            entities = _configured_entities(hass)
 
         update_tasks = []
-        for device in devices:
-            if not hasattr(device["entity"], method["method"]):
+        for entity in entities:
+            if not hasattr(entity, method["method"]):
                 continue
-            await getattr(device["entity"], method["method"])(**params)
-            update_tasks.append(device["entity"].async_update_ha_state(True))
+            await getattr(entity, method["method"])(**params)
+            update_tasks.append(entity.async_update_ha_state(True))
 
         if update_tasks:
-            await asyncio.wait(update_tasks, loop=hass.loop)
+            await asyncio.gather(*update_tasks)
 
     # Register services and handler
     for ac_service in SERVICE_TO_METHOD:
@@ -215,91 +288,232 @@ async def async_setup_entry(hass, config_entry, async_add_entities):
             CLIMATE_DOMAIN, ac_service, async_service_handler, schema=schema
         )
 
+    @callback
+    def async_remove_services():
+        """Remove the services once the last device is unloaded."""
+        if _configured_entities(hass):
+            return
+        for ac_service in SERVICE_TO_METHOD:
+            hass.services.async_remove(CLIMATE_DOMAIN, ac_service)
 
-# # pylint: disable=unused-argument
-# @asyncio.coroutine
-# def async_setup_platform(hass, config, async_add_entities, discovery_info=None):
-#     """Set up the air conditioner Miot from config."""
+    config_entry.async_on_unload(async_remove_services)
 
-#     name = hass.data[DOMAIN][CONF_NAME]
-#     retries = hass.data[DOMAIN][CONF_RETRIES]
 
+# pylint: disable=unused-argument
+async def async_setup_platform(hass, config, async_add_entities, discovery_info=None):
+    """ Setup one zone entity per zone discovered from yaml config. """
+    if discovery_info is None:
+        return
 
-class AirConditionerMiotException(DeviceException):
-    pass
+    entity = XiaomiZoneClimateEntity(
+        discovery_info[CONF_NAME], discovery_info[CONF_ENTITIES]
+    )
+    async_add_entities([entity])
 
 
-class XiaomiClimateEntity(ClimateEntity):
+class XiaomiClimateEntity(CoordinatorEntity, RestoreEntity, ClimateEntity):
     """Representation of Xiaomi Air Conditioner Miot device."""
 
     # Device initialization and registration
 
-    def __init__(self, name, device, retries, unique_id, device_info):
+    def __init__(
+        self, coordinator, name, queue, unique_id, external_sensor=None, controller=None
+    ):
         """Initialize the climate entity."""
+        super().__init__(coordinator)
         self._name = name
-        self._device = device
-        self._retry = 0
-        self._retries = retries
-        self._identifier = {(DOMAIN, unique_id)}
+        self._queue = queue
         self._unique_id = f"{unique_id}-climate"
-        self._device_info = device_info
+
+        # With an external sensor, the target temperature is the desired room
+        # temperature and the device setpoint is driven by `controller`.
+        self._external_sensor = external_sensor
+        self._controller = controller
+        self._external = None
+        self._desired = None
 
         self._state = None
         self._swing_mode = None
 
-        self._available = False
         self._state_attrs = {}
         self._available_attributes = AVAILABLE_ATTRIBUTES_CLIMATE
+        # Time of the last poll checked against the schedule.
+        self._reconciled_poll = None
+
+    async def async_added_to_hass(self):
+        """Pick up a status fetched before the entity was added.
+
+        Until the device answers, show the state saved before the restart,
+        flagged as stale.
+        """
+        await super().async_added_to_hass()
+        last_state = await self.async_get_last_state()
+
+        if self._external_sensor is not None:
+            if last_state is not None:
+                self._desired = last_state.attributes.get(ATTR_TEMPERATURE)
+            external = self.hass.states.get(self._external_sensor)
+            # A sensor not loaded yet is at least in the registry.
+            if external is None and (
+                er.async_get(self.hass).async_get(self._external_sensor) is None
+            ):
+                _LOGGER.warning(
+                    "External sensor %s of %s does not exist, "
+                    "the setpoint is not corrected",
+                    self._external_sensor,
+                    self.entity_id,
+                )
+            self._async_update_external(external)
+            self.async_on_remove(
+                async_track_state_change_event(
+                    self.hass, [self._external_sensor], self._async_external_changed
+                )
+            )
+
+        if self.coordinator.data is not None:
+            self._async_update_from_state(self.coordinator.data)
+            return
+
+        # Nothing known about a unit which was unreachable before.
+        if last_state is None or last_state.state in (
+            STATE_UNAVAILABLE,
+            STATE_UNKNOWN,
+        ):
+            return
+
+        attributes = last_state.attributes
+        self._state = last_state.state != HVAC_MODE_OFF
+        self._swing_mode = attributes.get(ATTR_SWING_MODE)
+        self._state_attrs.update(
+            {
+                key: attributes[key]
+                for key in self._available_attributes
+                if key in attributes
+            }
+        )
+
+        # The climate state itself carries the mode, fan and temperatures.
+        if last_state.state in MODES_TO_MIIO:
+            self._state_attrs[ATTR_MODE] = MODES_TO_MIIO[last_state.state].value
+        if attributes.get(ATTR_FAN_MODE) in FanSpeed.__members__:
+            self._state_attrs[ATTR_FAN_SPEED] = FanSpeed[
+                attributes[ATTR_FAN_MODE]
+            ].value
+        if self._controller is None:
+            setpoint = attributes.get(ATTR_TEMPERATURE)
+            current = attributes.get(ATTR_CURRENT_TEMPERATURE)
+        else:
+            # Those are the room's, the device's own are extra attributes.
+            setpoint = attributes.get(ATTR_TARGET_TEMPERATURE)
+            current = attributes.get(ATTR_DEVICE_TEMPERATURE)
+        self._state_attrs[ATTR_TARGET_TEMPERATURE] = setpoint
+        self._state_attrs[ATTR_TEMPERATURE] = setpoint
+        self._state_attrs[ATTR_CURRENT_TEMPERATURE] = current
+        self._state_attrs[ATTR_STALE] = True
+
+    async def async_will_remove_from_hass(self):
+        """Drop what the schedule planned for this unit."""
+        await super().async_will_remove_from_hass()
+        schedule = self.hass.data[DOMAIN].get(DATA_SCHEDULE)
+        if schedule is not None:
+            schedule.async_cancel(self.entity_id)
+
+    @callback
+    def _handle_coordinator_update(self):
+        """Handle a status polled by the coordinator."""
+        if self.coordinator.data is not None:
+            self._async_update_from_state(self.coordinator.data)
+        self.async_write_ha_state()
+
+    @callback
+    def _async_update_from_state(self, state):
+        self._state = state.is_on
+
+        # TODO: Support horizontal for other devices
+        if state.vertical_swing:
+            self._swing_mode = SWING_VERTICAL
+        else:
+            self._swing_mode = SWING_OFF
 
-    async def async_update(self):
-        """Fetch state from the device."""
+        self._state_attrs.update(
+            {
+                key: self._extract_value_from_attribute(state, value)
+                for key, value in self._available_attributes.items()
+            }
+        )
+        self._state_attrs[ATTR_STALE] = False
+
+        history = self.coordinator.history
+        self._state_attrs[ATTR_TEMPERATURE_TREND] = history.temperature_slope()
+        self._state_attrs[ATTR_DUTY_CYCLE] = history.duty_cycle()
+        self._state_attrs[ATTR_TIME_IN_MODE] = history.time_in_mode()
+        # self._state_attrs[ATTR_TIMER] = str(self._state_attrs[ATTR_TIMER])
+        # self._state_attrs[ATTR_CLEAN] = str(self._state_attrs[ATTR_CLEAN])
+
+        # Only a new status, not one kept from before a failed poll, can
+        # tell that a timer was lost.
+        schedule = self.hass.data[DOMAIN].get(DATA_SCHEDULE)
+        last_poll = self.coordinator.last_poll
+        if (
+            schedule is not None
+            and schedule.is_scheduled(self.entity_id)
+            and last_poll != self._reconciled_poll
+        ):
+            self._reconciled_poll = last_poll
+            self.hass.async_create_task(schedule.async_reconcile(self, state))
+
+        if self._controller is not None:
+            if self._desired is None:
+                self._desired = self._state_attrs[ATTR_TARGET_TEMPERATURE]
+            self._async_control()
+
+    @callback
+    def _async_external_changed(self, event):
+        """Follow the external sensor and correct the setpoint if needed."""
+        self._async_update_external(event.data.get("new_state"))
+        self._async_control()
+        self.async_write_ha_state()
+        self.coordinator.async_notify_changed()
+
+    @callback
+    def _async_update_external(self, state):
         try:
-            state = await self.hass.async_add_executor_job(self._device.status)
-            _LOGGER.debug("Got new state: %s", state)
-
-            self._available = True
-            self._state = state.is_on
-
-            # TODO: Support horizontal for other devices
-            if state.vertical_swing:
-                self._swing_mode = SWING_VERTICAL
-            else:
-                self._swing_mode = SWING_OFF
-
-            self._state_attrs.update(
-                {
-                    key: self._extract_value_from_attribute(state, value)
-                    for key, value in self._available_attributes.items()
-                }
+            self._external = float(state.state)
+        except (AttributeError, ValueError):
+            self._external = None
+
+    @callback
+    def _async_control(self, force=False):
+        """Send the setpoint computed by the controller, if it changed."""
+        # Without a status from the device, the setpoint it runs at is unknown.
+        if not self._state or self.coordinator.data is None:
+            return
+
+        setpoint = self._controller.update(
+            self._desired,
+            self._external,
+            self._state_attrs.get(ATTR_TARGET_TEMPERATURE),
+            force,
+        )
+        if setpoint is None:
+            return
+
+        _LOGGER.debug(
+            "Room at %s, desired %s: setting device to %s",
+            self._external,
+            self._desired,
+            setpoint,
+        )
+        self.hass.async_create_task(
+            self._try_set_property(
+                "Setting target temperature of the miio device failed.",
+                "target_temperature",
+                setpoint,
             )
-            self.temperature = self.target_temperature
-            # self._state_attrs[ATTR_TIMER] = str(self._state_attrs[ATTR_TIMER])
-            # self._state_attrs[ATTR_CLEAN] = str(self._state_attrs[ATTR_CLEAN])
-            self._retry = 0
-
-        except DeviceException as ex:
-            self._retry = self._retry + 1
-            if self._retry < self._retries:
-                _LOGGER.info(
-                    "Got exception while fetching the state: %s , _retry=%s",
-                    ex,
-                    self._retry,
-                )
-            else:
-                self._available = False
-                _LOGGER.error(
-                    "Got exception while fetching the state: %s , _retry=%s",
-                    ex,
-                    self._retry,
-                )
+        )
 
     # Implement abstract `Entity` class
 
-    @property
-    def should_poll(self):
-        """Poll the device."""
-        return True
-
     @property
     def name(self):
         """Return the name of the device if any."""
@@ -312,14 +526,7 @@ class XiaomiClimateEntity(ClimateEntity):
 
     @property
     def device_info(self):
-        return {
-            "name": self._device_info.model,
-            "manufacturer": "Xiaomi",
-            "model": self._device_info.model,
-            "sw_version": self._device_info.firmware_version,
-            "hw_version": self._device_info.hardware_version,
-            "identifiers": self._identifier,
-        }
+        return self.coordinator.entity_device_info
 
     @property
     def icon(self) -> str:
@@ -328,12 +535,30 @@ class XiaomiClimateEntity(ClimateEntity):
     @property
     def available(self):
         """Return true when state is known."""
-        return self._available
+        return self.coordinator.last_update_success and bool(self._state_attrs)
+
+    @property
+    def controlled(self):
+        """Return true when the setpoint follows an external sensor."""
+        return self._controller is not None
 
     @property
-    def device_state_attributes(self):
+    def extra_state_attributes(self):
         """Return the state attributes of the device."""
-        return self._state_attrs
+        if self._controller is None:
+            return self._state_attrs
+
+        # Current and target temperature are the room's, keep the device's
+        # own reading apart.
+        attrs = {
+            key: value
+            for key, value in self._state_attrs.items()
+            if key not in (ATTR_CURRENT_TEMPERATURE, ATTR_TEMPERATURE)
+        }
+        attrs[ATTR_DEVICE_TEMPERATURE] = self._state_attrs.get(
+            ATTR_CURRENT_TEMPERATURE
+        )
+        return attrs
 
     # Implement `ClimateEntity` class
 
@@ -348,7 +573,7 @@ class XiaomiClimateEntity(ClimateEntity):
         if not self._state:
             return HVAC_MODE_OFF
 
-        return MODES_TO_HASS[self._state_attrs[ATTR_MODE]]
+        return MODES_TO_HASS.get(self._state_attrs.get(ATTR_MODE))
 
     @property
     def hvac_modes(self) -> list:
@@ -357,11 +582,15 @@ class XiaomiClimateEntity(ClimateEntity):
 
     @property
     def current_temperature(self) -> float:
-        return self._state_attrs[ATTR_TEMPERATURE]
+        if self._controller is not None and self._external is not None:
+            return self._external
+        return self._state_attrs.get(ATTR_CURRENT_TEMPERATURE)
 
     @property
     def target_temperature(self) -> float:
-        return self._state_attrs[ATTR_TARGET_TEMPERATURE]
+        if self._controller is not None and self._desired is not None:
+            return self._desired
+        return self._state_attrs.get(ATTR_TARGET_TEMPERATURE)
 
     @property
     def target_temperature_step(self) -> float:
@@ -369,10 +598,12 @@ class XiaomiClimateEntity(ClimateEntity):
 
     @property
     def is_aux_heat(self) -> bool:
-        return self._state_attrs[ATTR_HEATER]
+        return self._state_attrs.get(ATTR_HEATER)
 
     @property
     def fan_mode(self) -> str:
+        if self._state_attrs.get(ATTR_FAN_SPEED) is None:
+            return None
         return FanSpeed(self._state_attrs[ATTR_FAN_SPEED]).name
 
     @property
@@ -392,27 +623,24 @@ class XiaomiClimateEntity(ClimateEntity):
     async def async_set_temperature(self, **kwargs) -> None:
         """Set new target temperature."""
         temperature = kwargs.get(ATTR_TEMPERATURE)
-        if temperature is not None:
-            t_float = temperature - int(temperature)
-            if t_float < 0.25:
-                temperature = int(temperature)
-            elif t_float < 0.75:
-                temperature = int(temperature) + 0.5
-            else:
-                temperature = int(temperature) + 1
-
-            await self._try_command(
+        if temperature is not None and self._controller is not None:
+            self._desired = temperature
+            self._async_control(force=True)
+            self.async_write_ha_state()
+        elif temperature is not None:
+            temperature = _round_temperature(temperature)
+            await self._try_set_property(
                 "Setting target temperature of the miio device failed.",
-                self._device.set_target_temperature,
+                "target_temperature",
                 temperature,
             )
 
     async def async_set_fan_mode(self, fan_mode: str) -> None:
         """Set new target fan mode."""
-        await self._try_command(
+        await self._try_set_property(
             "Setting fan mode of the miio device failed.",
-            self._device.set_fan_speed,
-            FanSpeed[fan_mode],
+            "fan_speed",
+            FanSpeed[fan_mode].value,
         )
 
     async def async_set_hvac_mode(self, hvac_mode: str) -> None:
@@ -424,10 +652,10 @@ class XiaomiClimateEntity(ClimateEntity):
         elif not self._state:
             await self.async_turn_on()
 
-        await self._try_command(
+        await self._try_set_property(
             "Setting operation mode of the miio device failed.",
-            self._device.set_mode,
-            OperationMode(MODES_TO_MIIO[hvac_mode]),
+            "mode",
+            MODES_TO_MIIO[hvac_mode].value,
         )
 
     async def async_set_swing_mode(self, swing_mode: str) -> None:
@@ -436,32 +664,32 @@ class XiaomiClimateEntity(ClimateEntity):
         vertical = swing_mode == SWING_VERTICAL  # or swing_mode == SWING_BOTH
 
         # TODO: horizontal swing
-        await self._try_command(
+        await self._try_set_property(
             "Setting swing mode of the miio device failed.",
-            self._device.set_vertical_swing,
+            "vertical_swing",
             vertical,
         )
 
     async def async_turn_aux_heat_on(self) -> None:
         """Turn auxiliary heater on."""
-        await self._try_command(
+        await self._try_set_property(
             "Turning on aux heat of the miio device failed.",
-            self._device.set_heater,
+            "heater",
             True,
         )
 
     async def async_turn_aux_heat_off(self) -> None:
         """Turn auxiliary heater off."""
-        await self._try_command(
+        await self._try_set_property(
             "Turning off aux heat of the miio device failed.",
-            self._device.set_heater,
+            "heater",
             False,
         )
 
     async def async_turn_on(self):
         """Turn on HVAC."""
-        result = await self._try_command(
-            "Turning the miio device on failed.", self._device.on
+        result = await self._try_set_property(
+            "Turning the miio device on failed.", "power", True
         )
 
         if result:
@@ -469,8 +697,8 @@ class XiaomiClimateEntity(ClimateEntity):
 
     async def async_turn_off(self):
         """Turn off HVAC."""
-        result = await self._try_command(
-            "Turning the miio device off failed.", self._device.off
+        result = await self._try_set_property(
+            "Turning the miio device off failed.", "power", False
         )
 
         if result:
@@ -493,39 +721,70 @@ class XiaomiClimateEntity(ClimateEntity):
 
     async def async_set_fan_speed_percent(self, fan_speed_percent: int):
         """Set fan percent."""
-        await self._try_command(
+        await self._try_set_property(
             "Setting fan percent of the miio device failed.",
-            self._device.set_fan_speed_percent,
+            "fan_speed_percent",
             fan_speed_percent,
         )
 
     async def async_set_delay_on_timer(self, minutes: int):
         """Set delay on timer."""
-        await self._try_command(
+        await self._try_set_property(
             "Setting delay on timer of the miio device failed.",
-            self._device.set_timer,
-            minutes,
-            True,
+            "timer",
+            _timer_value(minutes, True),
         )
 
     async def async_set_delay_off_timer(self, minutes: int):
         """Set delay off timer."""
-        await self._try_command(
+        await self._try_set_property(
             "Setting delay off timer of the miio device failed.",
-            self._device.set_timer,
-            minutes,
-            False,
+            "timer",
+            _timer_value(minutes, False),
         )
 
-    async def async_cancel_timer(self, minutes: int):
+    async def async_cancel_timer(self):
         """Cancel delay timer."""
-        await self._try_command(
+        await self._try_set_property(
             "Cancelling delay timer of the miio device failed.",
-            self._device.set_timer,
-            0,
-            False,
+            "timer",
+            _timer_value(0, False),
         )
 
+    async def async_preset(self, hvac_mode: str, temperature=None):
+        """Write mode and setpoint without changing power."""
+        props = {"mode": MODES_TO_MIIO[hvac_mode].value}
+        if temperature is not None:
+            props["target_temperature"] = _round_temperature(temperature)
+        return await self.async_write_properties(props)
+
+    async def async_write_properties(self, props):
+        """Write several properties in one batch and apply them on success."""
+        from miio import DeviceException
+
+        try:
+            result = await self._queue.async_set_many(props)
+        except DeviceException as exc:
+            _LOGGER.error("Writing %s to the miio device failed. %s", props, exc)
+            return False
+
+        if result:
+            self.async_apply_properties(props)
+        return result
+
+    @callback
+    def async_apply_properties(self, props):
+        """Apply properties written by a batched command to the cached state."""
+        for key, value in props.items():
+            if key == "power":
+                self._state = value
+            elif key == "vertical_swing":
+                self._swing_mode = SWING_VERTICAL if value else SWING_OFF
+            for attr in PROPERTIES_TO_ATTRIBUTES.get(key, []):
+                self._state_attrs[attr] = value
+        self.async_write_ha_state()
+        self.coordinator.async_notify_changed()
+
     # Methods to fetch values from miio
 
     @staticmethod
@@ -536,17 +795,235 @@ class XiaomiClimateEntity(ClimateEntity):
 
         return value
 
-    async def _try_command(self, mask_error, func, *args, **kwargs):
-        """Call a miio device command handling error messages."""
+    async def _try_set_property(self, mask_error, key, value):
+        """Queue a property write to the miio device handling error messages."""
         from miio import DeviceException
 
         try:
-            result = await self.hass.async_add_job(partial(func, *args, **kwargs))
+            result = await self._queue.async_set(key, value)
+        except DeviceException as exc:
+            _LOGGER.error("%s %s", mask_error, exc)
+            return False
 
-            _LOGGER.debug("Response received from miio device: %s", result)
+        # Show the new value right away instead of forcing a poll.
+        if result:
+            self.async_apply_properties({key: value})
+        else:
+            _LOGGER.error("%s The device rejected the value.", mask_error)
+        return result
 
-            return result == SUCCESS
-        except DeviceException as exc:
-            _LOGGER.error(mask_error, exc)
-            self._available = False
+
+class XiaomiZoneClimateEntity(ClimateEntity):
+    """Representation of a group of Xiaomi Air Conditioner Miot devices."""
+
+    def __init__(self, name, member_ids):
+        """Initialize the zone entity."""
+        self._name = name
+        self._member_ids = member_ids
+        self._state_attrs = {
+            ATTR_MEMBERS: member_ids,
+            ATTR_SUCCEEDED: [],
+            ATTR_FAILED: [],
+        }
+
+    async def async_added_to_hass(self):
+        """Follow the cached state of the members."""
+
+        @callback
+        def _async_member_changed(event):
+            self.async_write_ha_state()
+
+        self.async_on_remove(
+            async_track_state_change_event(
+                self.hass, self._member_ids, _async_member_changed
+            )
+        )
+
+    @property
+    def _members(self):
+        return [
+            entity
+            for entity in _configured_entities(self.hass)
+            if entity.entity_id in self._member_ids
+        ]
+
+    @property
+    def _available_members(self):
+        return [entity for entity in self._members if entity.available]
+
+    def _members_value(self, func):
+        """Return the values of `func` over available members, skipping unknowns."""
+        values = []
+        for entity in self._available_members:
+            try:
+                values.append(func(entity))
+            except (KeyError, ValueError):
+                continue
+        return [value for value in values if value is not None]
+
+    def _mean(self, func):
+        values = self._members_value(func)
+        if not values:
+            return None
+        return round(sum(values) / len(values), 1)
+
+    def _common(self, func):
+        values = self._members_value(func)
+        if not values:
+            return None
+        return Counter(values).most_common(1)[0][0]
+
+    # Implement abstract `Entity` class
+
+    @property
+    def should_poll(self):
+        """State is computed from the members, no polling needed."""
+        return False
+
+    @property
+    def name(self):
+        """Return the name of the zone."""
+        return self._name
+
+    @property
+    def icon(self) -> str:
+        return "mdi:air-conditioner"
+
+    @property
+    def available(self):
+        """Return true when any member is available."""
+        return bool(self._available_members)
+
+    @property
+    def extra_state_attributes(self):
+        """Return the state attributes of the zone."""
+        return self._state_attrs
+
+    # Implement `ClimateEntity` class
+
+    @property
+    def temperature_unit(self) -> str:
+        """Return the unit of measurement used by the platform."""
+        return TEMP_CELSIUS
+
+    @property
+    def hvac_mode(self) -> str:
+        """Return the HVAC mode shared by most members which are on."""
+        mode = self._common(
+            lambda entity: None
+            if entity.hvac_mode == HVAC_MODE_OFF
+            else entity.hvac_mode
+        )
+        return mode or HVAC_MODE_OFF
+
+    @property
+    def hvac_modes(self) -> list:
+        """Return the list of available operation modes."""
+        return SUPPORTED_MODES
+
+    @property
+    def current_temperature(self) -> float:
+        return self._mean(lambda entity: entity.current_temperature)
+
+    @property
+    def target_temperature(self) -> float:
+        return self._mean(lambda entity: entity.target_temperature)
+
+    @property
+    def target_temperature_step(self) -> float:
+        return DEFAULT_TEMP_STEP
+
+    @property
+    def fan_mode(self) -> str:
+        return self._common(lambda entity: entity.fan_mode)
+
+    @property
+    def fan_modes(self) -> list:
+        return [i.name for i in FanSpeed]
+
+    @property
+    def supported_features(self) -> int:
+        """Return the list of supported features."""
+        return SUPPORT_FAN_MODE | SUPPORT_TARGET_TEMPERATURE
+
+    @property
+    def min_temp(self) -> float:
+        """Return the minimum temperature."""
+        return DEFAULT_MIN_TEMP
+
+    @property
+    def max_temp(self) -> float:
+        """Return the maximum temperature."""
+        return DEFAULT_MAX_TEMP
+
+    async def async_set_temperature(self, **kwargs) -> None:
+        """Set target temperature, and optionally hvac mode, on all members."""
+        props = {}
+        hvac_mode = kwargs.get(ATTR_HVAC_MODE)
+        if hvac_mode is not None:
+            props.update(self._hvac_mode_props(hvac_mode))
+        await self._async_send(props, kwargs.get(ATTR_TEMPERATURE))
+
+    async def async_set_hvac_mode(self, hvac_mode: str) -> None:
+        """Set hvac mode on all members."""
+        await self._async_send(self._hvac_mode_props(hvac_mode))
+
+    async def async_set_fan_mode(self, fan_mode: str) -> None:
+        """Set fan mode on all members."""
+        await self._async_send({"fan_speed": FanSpeed[fan_mode].value})
+
+    async def async_turn_on(self):
+        """Turn on all members."""
+        await self._async_send({"power": True})
+
+    async def async_turn_off(self):
+        """Turn off all members."""
+        await self._async_send({"power": False})
+
+    @staticmethod
+    def _hvac_mode_props(hvac_mode):
+        if hvac_mode == HVAC_MODE_OFF:
+            return {"power": False}
+        return {"power": True, "mode": MODES_TO_MIIO[hvac_mode].value}
+
+    @staticmethod
+    async def _async_write_member(entity, props, temperature):
+        """Write to one member, a controlled one gets the room setpoint."""
+        if temperature is None:
+            return await entity.async_write_properties(props)
+        if not entity.controlled:
+            return await entity.async_write_properties(
+                {**props, "target_temperature": _round_temperature(temperature)}
+            )
+
+        if props and not await entity.async_write_properties(props):
             return False
+        # The controller sends the device setpoint and reports its failures.
+        await entity.async_set_temperature(**{ATTR_TEMPERATURE: temperature})
+        return True
+
+    async def _async_send(self, props, temperature=None):
+        """Send one batched command per member, all members in parallel."""
+        if not props and temperature is None:
+            return
+
+        members = {entity.entity_id: entity for entity in self._members}
+        succeeded, failed = await async_fan_out(
+            {
+                entity_id: self._async_write_member(entity, props, temperature)
+                for entity_id, entity in members.items()
+            }
+        )
+
+        if failed:
+            _LOGGER.warning(
+                "Zone %s: command %s (temperature %s) failed on %s",
+                self._name,
+                props,
+                temperature,
+                failed,
+            )
+
+        self._state_attrs[ATTR_SUCCEEDED] = succeeded
+        self._state_attrs[ATTR_FAILED] = failed
+        self.async_write_ha_state()
@@ -0,0 +1,144 @@
+"""
+Per-device queue of MIoT property writes
+"""
+
+import asyncio
+import logging
+from collections import OrderedDict
+from time import monotonic
+
+from homeassistant.core import callback
+
+
+_LOGGER = logging.getLogger(__name__)
+
+# Minimum delay between two requests sent to the same device, in seconds.
+DEFAULT_COMMAND_INTERVAL = 0.5
+
+
+def _is_raw(key):
+    """Return true for the key of a raw write, miio keys are strings."""
+    return not isinstance(key, str)
+
+
+class CommandQueue:
+    """Collapse pending writes per property and dispatch them in batches.
+
+    A write to a property which is still pending replaces the queued value
+    (last write wins) and moves it behind the other pending properties, so
+    the order between different properties is the order of their latest
+    writes. Everything pending is sent as one `set_properties` request, at
+    most once every `interval` seconds.
+
+    Raw writes of MIoT properties are not collapsed: each is sent alone,
+    in turn with the batches queued before and after it.
+    """
+
+    def __init__(self, hass, transport, interval=DEFAULT_COMMAND_INTERVAL):
+        self._hass = hass
+        self._transport = transport
+        self._interval = interval
+        # miio key -> (value, futures waiting for the value to be written),
+        # or a key of its own -> (raw properties, [future]) for a raw write
+        self._pending = OrderedDict()
+        self._last_dispatch = 0
+        self._task = None
+
+    async def async_set(self, key, value):
+        """Queue a write, return True once it (or a newer one) was accepted."""
+        return await self.async_set_many({key: value})
+
+    async def async_set_many(self, props):
+        """Queue writes of several properties to be sent in the same batch."""
+        future = self._hass.loop.create_future()
+        for key, value in props.items():
+            _, futures = self._pending.pop(key, (None, []))
+            futures.append(future)
+            self._pending[key] = (value, futures)
+
+        self._async_start()
+        return await future
+
+    async def async_write(self, properties):
+        """Queue a list of {did, siid, piid, value} entries, return the results."""
+        future = self._hass.loop.create_future()
+        self._pending[object()] = (properties, [future])
+        self._async_start()
+        return await future
+
+    @callback
+    def _async_start(self):
+        if self._task is None or self._task.done():
+            self._task = self._hass.async_create_task(self._async_dispatch())
+
+    def _next_batch(self):
+        """Pop a raw write, or the writes by key queued before the next one."""
+        batch = OrderedDict()
+        while self._pending:
+            key = next(iter(self._pending))
+            if _is_raw(key) and batch:
+                break
+            batch[key] = self._pending.pop(key)
+            if _is_raw(key):
+                break
+        return batch
+
+    async def _async_dispatch(self):
+        while self._pending:
+            delay = self._last_dispatch + self._interval - monotonic()
+            if delay > 0:
+                await asyncio.sleep(delay)
+
+            batch = self._next_batch()
+            props = {key: value for key, (value, _) in batch.items()}
+            _LOGGER.debug("Dispatching queued writes: %s", props)
+            if _is_raw(next(iter(props))):
+                request = self._transport.async_write(*props.values())
+            else:
+                request = self._transport.async_set_properties(props)
+            send = self._hass.async_create_task(request)
+            waiters = [future for _, futures in batch.values() for future in futures]
+
+            def _abandon_if_unwanted(_):
+                # Every caller gave up: abort the request and its retries.
+                if all(future.cancelled() for future in waiters):
+                    send.cancel()
+
+            for future in waiters:
+                future.add_done_callback(_abandon_if_unwanted)
+
+            try:
+                await asyncio.wait([send])
+            except asyncio.CancelledError:
+                send.cancel()
+                self._cancel_futures(batch)
+                raise
+            self._last_dispatch = monotonic()
+
+            if send.cancelled():
+                continue
+            result = send.exception() or send.result()
+
+            for _, futures in batch.values():
+                for future in futures:
+                    if future.done():
+                        continue
+                    if isinstance(result, Exception):
+                        future.set_exception(result)
+                    else:
+                        future.set_result(result)
+
+    @callback
+    def async_cancel(self):
+        """Stop dispatching and cancel every write which is still pending."""
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+        self._cancel_futures(self._pending)
+        self._pending = OrderedDict()
+
+    @staticmethod
+    def _cancel_futures(batch):
+        for _, futures in batch.values():
+            for future in futures:
+                future.cancel()
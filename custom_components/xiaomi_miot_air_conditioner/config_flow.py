@@ -3,9 +3,19 @@ import logging
 import voluptuous as vol
 from homeassistant import config_entries
 from homeassistant.const import CONF_HOST, CONF_NAME, CONF_TOKEN
+from homeassistant.core import callback
+from homeassistant.helpers import selector
 
 from . import check_miot_device
-from .const import CONF_RETRIES, DOMAIN, MIOT_DEVICE_OK
+from .const import (
+    CONF_EXTERNAL_SENSOR,
+    CONF_HYSTERESIS,
+    CONF_MIN_DWELL,
+    CONF_RETRIES,
+    DOMAIN,
+    MIOT_DEVICE_OK,
+)
+from .control import DEFAULT_HYSTERESIS, DEFAULT_MIN_DWELL
 
 _LOGGER = logging.getLogger(__name__)
 
@@ -16,6 +26,11 @@ class XiaomiMiotClimateFlow(config_entries.ConfigFlow, domain=DOMAIN):
     VERSION = 1
     CONNECTION_CLASS = config_entries.CONN_CLASS_LOCAL_POLL
 
+    @staticmethod
+    @callback
+    def async_get_options_flow(config_entry):
+        return XiaomiMiotClimateOptionsFlow(config_entry)
+
     async def async_step_init(self, user_input=None):
         return await self.async_step_user(user_input)
 
@@ -30,7 +45,7 @@ class XiaomiMiotClimateFlow(config_entries.ConfigFlow, domain=DOMAIN):
         else:
             host = user_input.get(CONF_HOST)
             token = user_input.get(CONF_TOKEN)
-            ret = await check_miot_device(host, token)
+            ret = await check_miot_device(self.hass, host, token)
             if ret["code"] == MIOT_DEVICE_OK:
                 await self.async_set_unique_id(ret["unique_id"])
                 self._abort_if_unique_id_configured()
@@ -55,3 +70,46 @@ class XiaomiMiotClimateFlow(config_entries.ConfigFlow, domain=DOMAIN):
             ),
             errors=errors,
         )
+
+
+class XiaomiMiotClimateOptionsFlow(config_entries.OptionsFlow):
+    """Change connection and control options, applied by reloading the entry."""
+
+    def __init__(self, config_entry):
+        self.config_entry = config_entry
+
+    async def async_step_init(self, user_input=None):
+        if user_input is not None:
+            return self.async_create_entry(title="", data=user_input)
+
+        config = {**self.config_entry.data, **self.config_entry.options}
+        return self.async_show_form(
+            step_id="init",
+            data_schema=vol.Schema(
+                {
+                    vol.Required(CONF_HOST, default=config.get(CONF_HOST, "")): str,
+                    vol.Optional(
+                        CONF_RETRIES, default=config.get(CONF_RETRIES, 10)
+                    ): int,
+                    # Room temperature sensor, none to disable
+                    vol.Optional(
+                        CONF_EXTERNAL_SENSOR,
+                        description={
+                            "suggested_value": config.get(CONF_EXTERNAL_SENSOR)
+                        },
+                    ): selector.EntitySelector(
+                        selector.EntitySelectorConfig(
+                            domain="sensor", device_class="temperature"
+                        )
+                    ),
+                    vol.Optional(
+                        CONF_HYSTERESIS,
+                        default=config.get(CONF_HYSTERESIS, DEFAULT_HYSTERESIS),
+                    ): vol.Coerce(float),
+                    vol.Optional(
+                        CONF_MIN_DWELL,
+                        default=config.get(CONF_MIN_DWELL, DEFAULT_MIN_DWELL),
+                    ): int,
+                }
+            ),
+        )
@@ -1,3 +1,5 @@
+from enum import Enum
+
 DOMAIN = "xiaomi_miot_air_conditioner"
 
 
@@ -13,29 +15,82 @@ MODELS_SUPPORTED = [
     MODEL_AIRCONDITION_MC5,
 ]
 
+# MIoT property values, mirroring miio.airconditioner_miot so the platforms
+# can be loaded without importing python-miio.
+class OperationMode(Enum):
+    Cool = 2
+    Dry = 3
+    Fan = 4
+    Heat = 5
+
+
+class FanSpeed(Enum):
+    Auto = 0
+    Level1 = 1
+    Level2 = 2
+    Level3 = 3
+    Level4 = 4
+    Level5 = 5
+    Level6 = 6
+    Level7 = 7
+
+
 MIOT_DEVICE_OK = 0
 MIOT_UNSUPPORTED_DEVICE = 1
 MIOT_DEVICE_OFFLINE = 2
 
 
+CONF_AT = "at"
+CONF_DAYS = "days"
+CONF_EXTERNAL_SENSOR = "external_sensor"
+CONF_HVAC_MODE = "hvac_mode"
+CONF_HYSTERESIS = "hysteresis"
+CONF_MIN_DWELL = "min_dwell"
+CONF_PROGRAM = "program"
 CONF_RETRIES = "retries"
+CONF_SCHEDULES = "schedules"
+CONF_WORKERS = "workers"
+CONF_ZONES = "zones"
+
+
+DATA_SCHEDULE = "schedule"
+DATA_WORKERS = "workers"
+
+SIGNAL_DEVICE_UPDATED = f"{DOMAIN}_device_updated"
+
+
+# Longest delay accepted by the device timer
+TIMER_MAX_MINUTES = 720
 
 
 ATTR_BUZZER = "buzzer"
 ATTR_CLEAN = "clean"
 ATTR_CURRENT_TEMPERATURE = "current_temperature"
+ATTR_DEVICE_TEMPERATURE = "device_temperature"
 ATTR_DRYER = "dryer"
+ATTR_DUTY_CYCLE = "duty_cycle"
 ATTR_ECO = "eco"
+ATTR_ELECTRICITY = "electricity"
 ATTR_FAN_SPEED = "fan_speed"
 ATTR_FAN_SPEED_PERCENT = "fan_speed_percent"
 ATTR_HEATER = "heater"
+ATTR_FAILED = "last_command_failed"
 ATTR_LED = "led"
+ATTR_MEMBERS = "members"
 ATTR_MODEL = "model"
 ATTR_MODE = "mode"
+ATTR_PIID = "piid"
+ATTR_PROPERTIES = "properties"
 ATTR_RUNNING_DURATION = "running_duration"
+ATTR_SIID = "siid"
 ATTR_SLEEP_MODE = "sleep_mode"
+ATTR_STALE = "stale"
+ATTR_SUCCEEDED = "last_command_succeeded"
 ATTR_TARGET_TEMPERATURE = "target_temperature"
 ATTR_TEMPERATURE = "temperature"
+ATTR_TEMPERATURE_TREND = "temperature_trend"
+ATTR_TIME_IN_MODE = "time_in_mode"
 ATTR_TIMER = "timer"
 ATTR_TIMER_MINUTES = "minutes"
+ATTR_VALUE = "value"
 ATTR_VERTICAL_SWING = "vertical_swing"
@@ -0,0 +1,63 @@
+"""
+Closed-loop setpoint control from an external temperature sensor
+"""
+
+from time import monotonic
+
+DEFAULT_HYSTERESIS = 0.5
+DEFAULT_MIN_DWELL = 300
+
+
+def quantize(value, step, minimum, maximum):
+    """Round to the device step and clamp to its range."""
+    return min(max(round(value / step) * step, minimum), maximum)
+
+
+class SetpointController:
+    """Derive the device setpoint from the room temperature.
+
+    The unit regulates on its own sensor next to the coil, which does not
+    tell much about the room. Instead, the device setpoint is moved by the
+    error between the desired and the external temperature. It is left
+    alone while that error is within `hysteresis`, changed no sooner than
+    `min_dwell` seconds after the previous change, and only sent when the
+    value quantized to the device step actually differs.
+    """
+
+    def __init__(self, step, minimum, maximum, hysteresis, min_dwell):
+        self._step = step
+        self._minimum = minimum
+        self._maximum = maximum
+        self._hysteresis = hysteresis
+        self._min_dwell = min_dwell
+        self._last_change = None
+
+    def update(self, desired, external, current, force=False):
+        """Return the setpoint to send, or None when nothing should be sent.
+
+        `force` skips hysteresis and dwell, for a new desired temperature.
+        """
+        if desired is None or external is None:
+            return None
+
+        error = desired - external
+        now = monotonic()
+        if current is None:
+            raw = desired
+        else:
+            if not force:
+                if abs(error) < self._hysteresis:
+                    return None
+                if (
+                    self._last_change is not None
+                    and now - self._last_change < self._min_dwell
+                ):
+                    return None
+            raw = current + error
+
+        setpoint = quantize(raw, self._step, self._minimum, self._maximum)
+        if setpoint == current:
+            return None
+
+        self._last_change = now
+        return setpoint
@@ -0,0 +1,120 @@
+"""
+Per-device polling shared by all platforms
+"""
+
+import logging
+from datetime import timedelta
+from time import time
+
+from homeassistant.core import callback
+from homeassistant.helpers import device_registry as dr
+from homeassistant.helpers.dispatcher import async_dispatcher_send
+from homeassistant.helpers.update_coordinator import DataUpdateCoordinator, UpdateFailed
+
+from .const import DOMAIN, MODELS_SUPPORTED, SIGNAL_DEVICE_UPDATED
+from .history import StateHistory
+
+_LOGGER = logging.getLogger(__name__)
+
+SCAN_INTERVAL = timedelta(seconds=60)
+
+
+class AirConditionerMiotCoordinator(DataUpdateCoordinator):
+    """Fetch the status of one device for every entity attached to it.
+
+    The device is probed on the first successful poll rather than during
+    setup, so an offline unit does not delay Home Assistant startup: its
+    entities are added right away and stay unavailable until it answers.
+    A failed poll keeps the last known status until `retries` polls in a
+    row have failed.
+    """
+
+    def __init__(self, hass, entry_id, name, transport, retries, unique_id):
+        super().__init__(
+            hass,
+            _LOGGER,
+            name=f"{DOMAIN}_{name}",
+            update_interval=SCAN_INTERVAL,
+        )
+        self.entry_id = entry_id
+        self.transport = transport
+        self.device_name = name
+        self.unique_id = unique_id
+        self.device_info = None
+        self.history = StateHistory()
+        self.last_poll = None
+        self._retry = 0
+        self._retries = retries
+
+    @property
+    def entity_device_info(self):
+        """Return the device registry entry shared by the entities."""
+        info = {
+            "name": self.device_name,
+            "manufacturer": "Xiaomi",
+            "identifiers": {(DOMAIN, self.unique_id)},
+        }
+        if self.device_info is not None:
+            info.update(
+                {
+                    "name": self.device_info.model,
+                    "model": self.device_info.model,
+                    "sw_version": self.device_info.firmware_version,
+                    "hw_version": self.device_info.hardware_version,
+                }
+            )
+        return info
+
+    async def _async_update_data(self):
+        from miio import DeviceException
+
+        try:
+            # Probe the device once, then read its status.
+            probed = None
+            if self.device_info is None:
+                probed = await self.transport.async_info()
+            state = await self.transport.async_status()
+        except DeviceException as ex:
+            self._retry = self._retry + 1
+            if self.data is not None and self._retry < self._retries:
+                _LOGGER.info(
+                    "Got exception while fetching the state: %s , _retry=%s",
+                    ex,
+                    self._retry,
+                )
+                return self.data
+            raise UpdateFailed(f"Error communicating with air conditioner: {ex}")
+
+        if probed is not None:
+            self._async_set_device_info(probed)
+        _LOGGER.debug("Got new state: %s", state)
+        self._retry = 0
+        self.last_poll = time()
+        self.history.add(self.last_poll, state)
+        return state
+
+    @callback
+    def async_notify_changed(self):
+        """Tell websocket subscribers the cached state of the device changed."""
+        async_dispatcher_send(self.hass, SIGNAL_DEVICE_UPDATED, self.entry_id)
+
+    def _async_set_device_info(self, device_info):
+        if device_info.model not in MODELS_SUPPORTED:
+            _LOGGER.warning("Unsupported device %s found!", device_info.model)
+        _LOGGER.info(
+            "%s %s %s detected",
+            device_info.model,
+            device_info.firmware_version,
+            device_info.hardware_version,
+        )
+        self.device_info = device_info
+
+        registry = dr.async_get(self.hass)
+        entry = registry.async_get_device({(DOMAIN, self.unique_id)})
+        if entry is not None:
+            registry.async_update_device(
+                entry.id,
+                model=device_info.model,
+                sw_version=device_info.firmware_version,
+                hw_version=device_info.hardware_version,
+            )
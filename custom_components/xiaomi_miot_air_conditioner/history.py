@@ -0,0 +1,155 @@
+"""
+In-memory history of polled values with rolling statistics
+"""
+
+from array import array
+from math import isnan, nan
+
+DEFAULT_HISTORY_SIZE = 120
+
+
+def _float(value):
+    return nan if value is None else float(value)
+
+
+def _int(value):
+    return 0 if value is None else int(value)
+
+
+class StateHistory:
+    """Fixed-size ring buffer of the last polled values of one device.
+
+    Each field is kept in its own preallocated `array`, so memory does not
+    grow with uptime. The sums needed for the temperature slope and the
+    duty cycle are updated as samples enter and leave the buffer, so the
+    statistics cost the same whatever the size.
+    """
+
+    def __init__(self, size=DEFAULT_HISTORY_SIZE):
+        self._size = size
+        self._count = 0
+        self._next = 0
+
+        self._time = array("d", [0.0]) * size
+        self._temperature = array("d", [nan]) * size
+        self._target_temperature = array("d", [nan]) * size
+        self._mode = array("b", [0]) * size
+        self._fan_speed_percent = array("h", [0]) * size
+        self._is_on = array("b", [0]) * size
+
+        # Time origin of the regression sums, moved to the oldest sample
+        # each time the buffer wraps so they stay small whatever the uptime.
+        self._origin = None
+        # Least squares sums over the samples with a temperature.
+        self._n = 0
+        self._sum_t = 0.0
+        self._sum_y = 0.0
+        self._sum_ty = 0.0
+        self._sum_tt = 0.0
+        self._on_count = 0
+
+        self._mode_key = None
+        self._mode_since = None
+
+    def __len__(self):
+        return self._count
+
+    def _account(self, index, sign):
+        """Add (sign=1) or remove (sign=-1) a sample from the running sums."""
+        self._on_count += sign * self._is_on[index]
+        y = self._temperature[index]
+        if isnan(y):
+            return
+        t = self._time[index] - self._origin
+        self._n += sign
+        self._sum_t += sign * t
+        self._sum_y += sign * y
+        self._sum_ty += sign * t * y
+        self._sum_tt += sign * t * t
+
+    def _rebase(self):
+        """Move the time origin to the oldest sample and redo the sums."""
+        self._origin = self._time[self._next]
+        self._n = 0
+        self._sum_t = self._sum_y = self._sum_ty = self._sum_tt = 0.0
+        self._on_count = 0
+        for index in range(self._count):
+            self._account(index, 1)
+
+    def add(self, when, state):
+        """Record a status polled at `when` (a unix timestamp).
+
+        The raw values are read, so a property the device failed to report
+        is recorded as unknown instead of raising.
+        """
+        if self._origin is None:
+            self._origin = when
+
+        index = self._next
+        if self._count == self._size:
+            self._account(index, -1)
+        else:
+            self._count += 1
+
+        data = state.data
+        is_on = bool(data.get("power"))
+        mode = _int(data.get("mode"))
+        self._time[index] = when
+        self._temperature[index] = _float(data.get("temperature"))
+        self._target_temperature[index] = _float(data.get("target_temperature"))
+        self._mode[index] = mode
+        self._fan_speed_percent[index] = _int(data.get("fan_speed_percent"))
+        self._is_on[index] = is_on
+        self._account(index, 1)
+        self._next = (index + 1) % self._size
+        if self._next == 0:
+            self._rebase()
+
+        # Off counts as a mode of its own.
+        mode_key = mode if is_on else 0
+        if mode_key != self._mode_key:
+            self._mode_key = mode_key
+            self._mode_since = when
+
+    def temperature_slope(self):
+        """Return the temperature trend over the buffer, in degrees per hour."""
+        denominator = self._n * self._sum_tt - self._sum_t * self._sum_t
+        if self._n < 2 or denominator <= 0:
+            return None
+        slope = (self._n * self._sum_ty - self._sum_t * self._sum_y) / denominator
+        return round(slope * 3600, 2)
+
+    def duty_cycle(self):
+        """Return the share of samples with the unit running."""
+        if not self._count:
+            return None
+        return round(self._on_count / self._count, 3)
+
+    def time_in_mode(self):
+        """Return how long the unit has been in its current mode, in seconds."""
+        if not self._count:
+            return None
+        last = self._time[(self._next - 1) % self._size]
+        return round(last - self._mode_since)
+
+    def samples(self):
+        """Return the buffered samples, oldest first."""
+        start = (self._next - self._count) % self._size
+        samples = []
+        for offset in range(self._count):
+            index = (start + offset) % self._size
+            samples.append(
+                {
+                    "time": self._time[index],
+                    "temperature": None
+                    if isnan(self._temperature[index])
+                    else self._temperature[index],
+                    "target_temperature": None
+                    if isnan(self._target_temperature[index])
+                    else self._target_temperature[index],
+                    "mode": self._mode[index],
+                    "fan_speed_percent": self._fan_speed_percent[index],
+                    "is_on": bool(self._is_on[index]),
+                }
+            )
+        return samples
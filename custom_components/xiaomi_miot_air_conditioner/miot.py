@@ -0,0 +1,278 @@
+"""
+Batched MIoT property access shared by the platforms
+"""
+
+import asyncio
+import importlib
+import logging
+import sys
+import threading
+from time import monotonic
+
+_LOGGER = logging.getLogger(__name__)
+
+# Time allowed for one device operation, retries included, in seconds.
+DEFAULT_TIMEOUT = 10
+
+# Longest wait for a single UDP reply, as python-miio's own default.
+ATTEMPT_TIMEOUT = 5
+
+# Properties per `get_properties` request accepted by the devices.
+MAX_PROPERTIES = 15
+
+# Shortest time between two attempts of a command, in seconds.
+RETRY_DELAY = 0.5
+
+
+async def async_import_miio(hass):
+    """Import python-miio in the executor, the first time a device needs it.
+
+    python-miio loads its whole device catalogue on import, so it is kept
+    out of module level to not slow down Home Assistant startup and config
+    flows when no device is set up.
+    """
+    if "miio" not in sys.modules:
+        await hass.async_add_executor_job(importlib.import_module, "miio")
+    return sys.modules["miio"]
+
+
+def property_mapping(device):
+    """Return the {miio key: {siid, piid}} mapping of a device.
+
+    python-miio 0.5.9 replaced the `mapping` class attribute by a mapping
+    per model. All the supported models share one, and looking it up by
+    model would query the device for its model.
+    """
+    mapping = getattr(device, "mapping", None)
+    if mapping is None:
+        mapping = next(iter(device._mappings.values()))
+    return mapping
+
+
+def properties_payload(device, props):
+    """Build one `set_properties` payload from a {miio key: value} dict."""
+    mapping = property_mapping(device)
+    return [
+        {"did": key, **mapping[key], "value": value}
+        for key, value in props.items()
+    ]
+
+
+def split_properties(properties):
+    """Split a list of {did, siid, piid} entries in requests the device accepts."""
+    return [
+        properties[start : start + MAX_PROPERTIES]
+        for start in range(0, len(properties), MAX_PROPERTIES)
+    ]
+
+
+def status_requests(device):
+    """Return the requests reading every mapped property of a device."""
+    return split_properties(
+        [{"did": key, **value} for key, value in property_mapping(device).items()]
+    )
+
+
+def property_values(results):
+    """Return {miio key: value or None} from `get_properties` results."""
+    return {
+        item["did"]: item["value"] if item.get("code") == 0 else None
+        for item in results
+    }
+
+
+def is_success(result):
+    """Return True when every property in a MIoT response was accepted."""
+    return bool(result) and all(item.get("code") == 0 for item in result)
+
+
+def is_retryable(ex):
+    """Return True when a failed attempt is worth another one.
+
+    That is when the device did not answer, or asked for the command to
+    be sent again. An error it replied with is final, as in python-miio.
+    """
+    from miio.exceptions import RecoverableError
+
+    return isinstance(ex, RecoverableError) or isinstance(ex.__cause__, OSError)
+
+
+def handshake(protocol, timeout):
+    """Do what `MiIOProtocol.send_handshake` does, within `timeout` seconds.
+
+    python-miio waits up to 5 seconds for the handshake reply, whatever is
+    left of the deadline.
+    """
+    from miio import DeviceException
+    from miio.miioprotocol import MiIOProtocol
+
+    try:
+        message = MiIOProtocol.discover(protocol.ip, timeout)
+    except OSError as ex:
+        raise DeviceException(f"Unable to discover the device {protocol.ip}") from ex
+    if message is None:
+        raise DeviceException(
+            f"Unable to discover the device {protocol.ip}"
+        ) from TimeoutError()
+
+    header = message.header.value
+    protocol._device_id = header.device_id
+    protocol._device_ts = header.ts
+    protocol._discovered = True
+
+
+def send_with_deadline(device, command, parameters, deadline, cancelled):
+    """Send one command, one attempt at a time. Blocking.
+
+    `deadline` is a `time.monotonic` value and `cancelled` a
+    `threading.Event`, both checked before each attempt. Only attempts
+    which got no reply, or a recoverable error, are retried.
+    """
+    from miio import DeviceException
+
+    protocol = device._protocol
+    while True:
+        started = monotonic()
+        remaining = deadline - started
+        if cancelled.is_set():
+            raise DeviceException(f"{command} cancelled")
+        if remaining <= 0:
+            raise DeviceException(f"{command} timed out")
+
+        try:
+            if not protocol._discovered:
+                handshake(protocol, min(ATTEMPT_TIMEOUT, remaining))
+                remaining = deadline - monotonic()
+                if remaining <= 0:
+                    raise DeviceException(f"{command} timed out")
+            protocol._timeout = min(ATTEMPT_TIMEOUT, remaining)
+            return device.send(command, parameters, retry_count=0)
+        except DeviceException as ex:
+            _LOGGER.debug("Attempt of %s failed: %s", command, ex)
+            if not is_retryable(ex) or cancelled.is_set() or deadline <= monotonic():
+                raise
+            if isinstance(ex.__cause__, OSError):
+                # Handshake again first, as python-miio's own retries do.
+                protocol._discovered = False
+            pause = min(started + RETRY_DELAY, deadline) - monotonic()
+            if pause > 0:
+                cancelled.wait(pause)
+
+
+class MiotTransport:
+    """Deadline-bound access to one device.
+
+    python-miio retries inside the blocking call, so a cancelled caller
+    used to leave an executor thread waiting on the socket until all the
+    retries ran out. Here the retries are done one attempt at a time: each
+    attempt waits at most for what is left of the deadline, and none is
+    started once the deadline has passed or the caller was cancelled.
+    Only one request is in flight per device; the next one waits for the
+    thread to be released, not for the abandoned caller.
+    """
+
+    def __init__(self, hass, device, timeout=DEFAULT_TIMEOUT):
+        self._hass = hass
+        self.device = device
+        self._timeout = timeout
+        self._lock = asyncio.Lock()
+        # Sent unchanged on every poll, so that their encoding is reused.
+        self._status_requests = None
+
+    def _release(self, future):
+        self._lock.release()
+        # Retrieve the result of a request whose caller went away.
+        if not future.cancelled():
+            future.exception()
+
+    async def async_send(self, command, parameters=None, timeout=None):
+        """Send a command to the device within `timeout` seconds."""
+        deadline = monotonic() + (self._timeout if timeout is None else timeout)
+        cancelled = threading.Event()
+
+        await self._lock.acquire()
+        future = self._hass.async_add_executor_job(
+            send_with_deadline, self.device, command, parameters, deadline, cancelled
+        )
+        future.add_done_callback(self._release)
+        try:
+            return await asyncio.shield(future)
+        except asyncio.CancelledError:
+            cancelled.set()
+            raise
+
+    async def async_set_properties(self, props, timeout=None):
+        """Write several properties within a single request."""
+        result = await self.async_write(
+            properties_payload(self.device, props), timeout
+        )
+        _LOGGER.debug("Response received from miio device: %s", result)
+        return is_success(result)
+
+    async def async_read(self, properties, timeout=None):
+        """Read a list of {did, siid, piid} entries, return the raw results.
+
+        Lists longer than what the device accepts are split in several
+        requests, sharing the same deadline.
+        """
+        return await self._async_read_requests(split_properties(properties), timeout)
+
+    async def _async_read_requests(self, requests, timeout):
+        deadline = monotonic() + (self._timeout if timeout is None else timeout)
+        results = []
+        for request in requests:
+            results.extend(
+                await self.async_send("get_properties", request, deadline - monotonic())
+            )
+        return results
+
+    async def async_write(self, properties, timeout=None):
+        """Write a list of {did, siid, piid, value} entries in one request."""
+        return await self.async_send("set_properties", properties, timeout)
+
+    async def async_get_properties(self, keys, timeout=None):
+        """Read properties by miio key, return {key: value or None}."""
+        mapping = property_mapping(self.device)
+        properties = [{"did": key, **mapping[key]} for key in keys]
+        return property_values(await self.async_read(properties, timeout))
+
+    async def async_status(self, timeout=None):
+        """Read the status of the device, like `AirConditionerMiot.status`."""
+        from miio.airconditioner_miot import AirConditionerMiotStatus
+
+        if self._status_requests is None:
+            self._status_requests = status_requests(self.device)
+        results = await self._async_read_requests(self._status_requests, timeout)
+        return AirConditionerMiotStatus(property_values(results))
+
+    async def async_info(self, timeout=None):
+        """Read the device info, like `Device.info`."""
+        from miio.device import DeviceInfo
+
+        return DeviceInfo(await self.async_send("miIO.info", None, timeout))
+
+
+async def async_fan_out(targets):
+    """Await one batched write per device, all devices in parallel.
+
+    `targets` maps a key (e.g. entity_id) to an awaitable returning
+    whether the device accepted the write.
+    Returns the lists of keys which succeeded and failed.
+    """
+    keys = list(targets)
+    results = await asyncio.gather(
+        *(targets[key] for key in keys), return_exceptions=True
+    )
+
+    succeeded, failed = [], []
+    for key, result in zip(keys, results):
+        if isinstance(result, BaseException):
+            _LOGGER.error("Batched write to %s failed: %s", key, result)
+            failed.append(key)
+        elif result:
+            succeeded.append(key)
+        else:
+            _LOGGER.error("Batched write to %s was rejected", key)
+            failed.append(key)
+
+    return succeeded, failed
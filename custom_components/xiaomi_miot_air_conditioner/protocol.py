@@ -0,0 +1,199 @@
+"""
+Per-device miIO packet encoding with the cipher state derived once
+"""
+
+import calendar
+import hashlib
+import json
+import logging
+import socket
+import struct
+from datetime import datetime, timedelta
+
+from cryptography.hazmat.backends import default_backend
+from cryptography.hazmat.primitives.ciphers import Cipher, algorithms, modes
+from miio.exceptions import DeviceException
+from miio.miioprotocol import MiIOProtocol
+from miio.protocol import Message
+
+_LOGGER = logging.getLogger(__name__)
+
+HEADER_SIZE = 32
+MAGIC = b"\x21\x31"
+BLOCK_SIZE = 16
+
+# Read requests whose JSON is kept, per device.
+MAX_TEMPLATES = 8
+
+_EPOCH = datetime(1970, 1, 1)
+
+
+class ProtocolContext:
+    """Encode and decode the packets of one device.
+
+    python-miio derives the AES key and IV from the token with MD5, and
+    rebuilds its construct structs, on every message. Here they are
+    derived once, the header is written into one preallocated buffer, and
+    the JSON of read requests sent again and again (the status poll) is
+    serialized only the first time. The bytes on the wire are the same.
+    """
+
+    def __init__(self, token):
+        self.token = token
+        key = hashlib.md5(token).digest()  # nosec
+        iv = hashlib.md5(key + token).digest()  # nosec
+        self._cipher = Cipher(
+            algorithms.AES(key), modes.CBC(iv), backend=default_backend()
+        )
+        self._header = bytearray(HEADER_SIZE)
+        self._header[0:2] = MAGIC
+        # id(parameters) -> (parameters, their JSON)
+        self._templates = {}
+
+    def encrypt(self, plaintext):
+        """Encrypt with PKCS7 padding."""
+        padding = BLOCK_SIZE - len(plaintext) % BLOCK_SIZE
+        encryptor = self._cipher.encryptor()
+        return (
+            encryptor.update(plaintext + bytes((padding,)) * padding)
+            + encryptor.finalize()
+        )
+
+    def decrypt(self, ciphertext):
+        """Decrypt and remove the PKCS7 padding."""
+        decryptor = self._cipher.decryptor()
+        padded = decryptor.update(ciphertext) + decryptor.finalize()
+        if not padded or not 0 < padded[-1] <= BLOCK_SIZE:
+            raise ValueError("Invalid padding")
+        return padded[: -padded[-1]]
+
+    def payload(self, request_id, command, parameters):
+        """Serialize a request like python-miio does, null terminated.
+
+        The parameters of `get_properties` are looked up by identity, so
+        a read request sent again must be the same, unmodified, list.
+        """
+        if command != "get_properties":
+            return (
+                json.dumps({"id": request_id, "method": command, "params": parameters})
+                .encode("utf-8")
+                + b"\x00"
+            )
+
+        template = self._templates.get(id(parameters))
+        if template is None or template[0] is not parameters:
+            if len(self._templates) >= MAX_TEMPLATES:
+                self._templates.clear()
+            template = (parameters, json.dumps(parameters).encode("utf-8"))
+            self._templates[id(parameters)] = template
+        return b'{"id": %d, "method": "get_properties", "params": %s}\x00' % (
+            request_id,
+            template[1],
+        )
+
+    def encode(self, payload, device_id, ts):
+        """Return the packet of an encoded request."""
+        data = self.encrypt(payload)
+        header = self._header
+        struct.pack_into(">H", header, 2, HEADER_SIZE + len(data))
+        header[8:12] = device_id
+        struct.pack_into(">I", header, 12, ts)
+        # The checksum is computed with the token in its place.
+        header[16:32] = self.token
+        checksum = hashlib.md5(header)  # nosec
+        checksum.update(data)
+        header[16:32] = checksum.digest()
+        return bytes(header) + data
+
+    def verify(self, packet):
+        """Return True when a reply is well formed and signed with the token."""
+        if len(packet) <= HEADER_SIZE or packet[0:2] != MAGIC:
+            return False
+        checksum = hashlib.md5(packet[0:16])  # nosec
+        checksum.update(self.token)
+        checksum.update(packet[HEADER_SIZE:])
+        return checksum.digest() == packet[16:32]
+
+    def decode(self, packet):
+        """Return the JSON payload of a verified reply."""
+        return json.loads(self.decrypt(packet[HEADER_SIZE:]).rstrip(b"\x00"))
+
+
+class FastProtocol(MiIOProtocol):
+    """`MiIOProtocol` encoding its requests with a `ProtocolContext`.
+
+    Single attempts without extra parameters, which is how the transport
+    sends everything, take the fast path. The handshake, retries and
+    replies which are not plain JSON are left to python-miio, and the
+    request id is kept as python-miio keeps it.
+    """
+
+    def __init__(self, ip, token, timeout=5):
+        super().__init__(ip, token, timeout=timeout)
+        self._context = ProtocolContext(self.token)
+
+    def send(self, command, parameters=None, retry_count=3, *, extra_parameters=None):
+        if retry_count or extra_parameters is not None:
+            return super().send(
+                command, parameters, retry_count, extra_parameters=extra_parameters
+            )
+
+        if not self.lazy_discover or not self._discovered:
+            self.send_handshake()
+
+        context = self._context
+        request_id = self._id
+        packet = context.encode(
+            context.payload(
+                request_id, command, [] if parameters is None else parameters
+            ),
+            self._device_id,
+            calendar.timegm(self._device_ts.timetuple()) + 1,
+        )
+        _LOGGER.debug("%s:%s >>: %s %s", self.ip, self.port, command, parameters)
+
+        with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as sock:
+            sock.settimeout(self._timeout)
+            try:
+                sock.sendto(packet, (self.ip, self.port))
+                data, _ = sock.recvfrom(4096)
+            except OSError as ex:
+                # Handshake again and skip ids on the next attempt, as
+                # python-miio's own retries do.
+                self._MiIOProtocol__id += 100
+                self._discovered = False
+                raise DeviceException("No response from the device") from ex
+
+        if not context.verify(data):
+            raise DeviceException(
+                "Got checksum error which indicates use "
+                "of an invalid token. "
+                "Please check your token!"
+            )
+        try:
+            reply = context.decode(data)
+        except ValueError:
+            reply = Message.parse(data, token=self.token).data.value
+
+        self._device_ts = _EPOCH + timedelta(
+            seconds=struct.unpack_from(">I", data, 12)[0]
+        )
+        # Carry on from the id the device answered to.
+        self._MiIOProtocol__id = reply["id"]
+        _LOGGER.debug("%s:%s (id: %s) << %s", self.ip, self.port, request_id, reply)
+        if "error" in reply:
+            self._handle_error(reply["error"])
+
+        try:
+            return reply["result"]
+        except KeyError:
+            return reply
+
+
+def use_fast_protocol(device):
+    """Replace the protocol of a python-miio device by a `FastProtocol`."""
+    protocol = device._protocol
+    device._protocol = FastProtocol(
+        protocol.ip, protocol.token.hex(), timeout=protocol._timeout
+    )
+    return device
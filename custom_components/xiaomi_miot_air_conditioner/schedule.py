@@ -0,0 +1,166 @@
+"""
+Weekly setpoint programs pushed ahead of time to the devices' own timer
+"""
+
+import logging
+from collections import namedtuple
+from datetime import datetime, timedelta
+from math import ceil
+
+from homeassistant.components.climate.const import HVAC_MODE_OFF
+from homeassistant.const import CONF_ENTITIES, CONF_NAME, WEEKDAYS
+from homeassistant.core import callback
+from homeassistant.helpers.event import async_track_point_in_time
+import homeassistant.util.dt as dt_util
+
+from .const import (
+    ATTR_TEMPERATURE,
+    CONF_AT,
+    CONF_DAYS,
+    CONF_HVAC_MODE,
+    CONF_PROGRAM,
+    TIMER_MAX_MINUTES,
+)
+
+_LOGGER = logging.getLogger(__name__)
+
+# Slack on the minutes left on the device timer, which counts down by
+# whole minutes between two polls.
+TIMER_TOLERANCE_MINUTES = 2
+
+Transition = namedtuple("Transition", ["when", "hvac_mode", "temperature"])
+
+
+def timer_armed(state, turn_on, minutes):
+    """Return True when the device timer is set for this transition."""
+    try:
+        timer = state.timer
+    except (AttributeError, TypeError, ValueError, IndexError):
+        # Not reported by the device.
+        return False
+    return (
+        timer.enabled
+        and timer.power_on == turn_on
+        and abs(timer.time_left.total_seconds() / 60 - minutes)
+        <= TIMER_TOLERANCE_MINUTES
+    )
+
+
+def next_transition(program, now):
+    """Return the first transition of a weekly program strictly after `now`."""
+    found = None
+    for offset in range(8):
+        day = (now + timedelta(days=offset)).date()
+        weekday = WEEKDAYS[day.weekday()]
+        for step in program:
+            if weekday not in step[CONF_DAYS]:
+                continue
+            when = datetime.combine(day, step[CONF_AT], tzinfo=now.tzinfo)
+            if when <= now or (found is not None and when >= found.when):
+                continue
+            found = Transition(
+                when, step[CONF_HVAC_MODE], step.get(ATTR_TEMPERATURE)
+            )
+        if found is not None:
+            return found
+    return None
+
+
+class ScheduleEngine:
+    """Keep every scheduled unit's timer armed for its next transition.
+
+    The device timer can only switch power, so a transition which turns a
+    unit on is pushed as its mode and setpoint written in advance plus a
+    delay-on timer, and one which turns it off as a delay-off timer. Only
+    a setpoint change on a unit which is already running needs Home
+    Assistant at the exact minute. The check runs on every successful
+    poll, so a timer cancelled by the IR remote or lost on a power cut is
+    pushed again.
+    """
+
+    def __init__(self, hass, schedules):
+        self._hass = hass
+        self._programs = {}
+        for schedule in schedules:
+            for entity_id in schedule[CONF_ENTITIES]:
+                if entity_id in self._programs:
+                    _LOGGER.warning(
+                        "%s is in several schedules, using %s",
+                        entity_id,
+                        schedule[CONF_NAME],
+                    )
+                self._programs[entity_id] = schedule[CONF_PROGRAM]
+        # entity_id -> transition already pushed to the device
+        self._pushed = {}
+        # entity_id -> cancel callback of a fallback run by Home Assistant
+        self._fallbacks = {}
+
+    def is_scheduled(self, entity_id):
+        """Return true when the unit follows a program."""
+        return entity_id in self._programs
+
+    async def async_reconcile(self, entity, state):
+        """Check a freshly polled unit against its program."""
+        program = self._programs.get(entity.entity_id)
+        if program is None:
+            return
+
+        now = dt_util.now()
+        transition = next_transition(program, now)
+        if transition is None:
+            return
+
+        minutes = ceil((transition.when - now).total_seconds() / 60)
+        if minutes > TIMER_MAX_MINUTES:
+            return
+
+        turn_on = transition.hvac_mode != HVAC_MODE_OFF
+        if turn_on and state.is_on:
+            self._async_schedule_fallback(entity, transition)
+            return
+        if not turn_on and not state.is_on:
+            return
+
+        if self._pushed.get(entity.entity_id) == transition and timer_armed(
+            state, turn_on, minutes
+        ):
+            return
+
+        _LOGGER.debug(
+            "Pushing %s to %s, %s minutes ahead", transition, entity.entity_id, minutes
+        )
+        if turn_on:
+            await entity.async_preset(transition.hvac_mode, transition.temperature)
+            await entity.async_set_delay_on_timer(minutes)
+        else:
+            await entity.async_set_delay_off_timer(minutes)
+        self._pushed[entity.entity_id] = transition
+
+    @callback
+    def _async_schedule_fallback(self, entity, transition):
+        """Apply a setpoint change on a running unit at the exact time."""
+        if self._pushed.get(entity.entity_id) == transition:
+            return
+
+        self.async_cancel(entity.entity_id)
+
+        async def _async_apply(now):
+            self._fallbacks.pop(entity.entity_id, None)
+            await entity.async_set_hvac_mode(transition.hvac_mode)
+            if transition.temperature is not None:
+                await entity.async_set_temperature(
+                    **{ATTR_TEMPERATURE: transition.temperature}
+                )
+
+        self._fallbacks[entity.entity_id] = async_track_point_in_time(
+            self._hass, _async_apply, transition.when
+        )
+        self._pushed[entity.entity_id] = transition
+
+    @callback
+    def async_cancel(self, entity_id):
+        """Forget what was pushed to a unit and drop its pending fallback."""
+        self._pushed.pop(entity_id, None)
+        unsub = self._fallbacks.pop(entity_id, None)
+        if unsub is not None:
+            unsub()
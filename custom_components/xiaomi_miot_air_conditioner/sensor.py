@@ -0,0 +1,153 @@
+"""
+Support for Xiaomi Air Conditioner Miot Version
+"""
+
+import logging
+
+from homeassistant.components.sensor import (
+    STATE_CLASS_MEASUREMENT,
+    STATE_CLASS_TOTAL_INCREASING,
+    SensorEntity,
+)
+from homeassistant.const import (
+    DEVICE_CLASS_ENERGY,
+    DEVICE_CLASS_TEMPERATURE,
+    ENERGY_KILO_WATT_HOUR,
+    STATE_UNAVAILABLE,
+    STATE_UNKNOWN,
+    TEMP_CELSIUS,
+    TIME_HOURS,
+)
+from homeassistant.helpers.restore_state import RestoreEntity
+from homeassistant.helpers.update_coordinator import CoordinatorEntity
+
+from .const import (
+    ATTR_CURRENT_TEMPERATURE,
+    ATTR_ELECTRICITY,
+    ATTR_RUNNING_DURATION,
+    ATTR_STALE,
+    DOMAIN,
+)
+
+_LOGGER = logging.getLogger(__name__)
+
+# Readings of the status polled by the coordinator, no extra request needed.
+# "key" is the MIoT property, read raw: its value is already in "unit", and
+# python-miio turns the running duration into a timedelta.
+SENSOR_PROPS = {
+    ATTR_CURRENT_TEMPERATURE: {
+        "name": "temperature",
+        "icon": "mdi:thermometer",
+        "key": "temperature",
+        "unit": TEMP_CELSIUS,
+        "device_class": DEVICE_CLASS_TEMPERATURE,
+        "state_class": STATE_CLASS_MEASUREMENT,
+    },
+    ATTR_ELECTRICITY: {
+        "name": "electricity",
+        "icon": "mdi:flash",
+        "key": "electricity",
+        "unit": ENERGY_KILO_WATT_HOUR,
+        "device_class": DEVICE_CLASS_ENERGY,
+        "state_class": STATE_CLASS_TOTAL_INCREASING,
+    },
+    ATTR_RUNNING_DURATION: {
+        "name": "running duration",
+        "icon": "mdi:timer-outline",
+        "key": "running_duration",
+        "unit": TIME_HOURS,
+        "device_class": None,
+        "state_class": STATE_CLASS_TOTAL_INCREASING,
+    },
+}
+
+
+async def async_setup_entry(hass, config_entry, async_add_entities):
+    """ Setup sensor entities with config entry forwarded. """
+    entry_id = config_entry.entry_id
+    config = hass.data[DOMAIN][entry_id]
+    coordinator = config["coordinator"]
+    name = config["name"]
+    uniq_id = config["unique_id"]
+
+    entities = [
+        XiaomiSensorEntity(coordinator, name, hass_key, uniq_id)
+        for hass_key in SENSOR_PROPS
+    ]
+
+    async_add_entities(entities)
+
+
+class XiaomiSensorEntity(SensorEntity, CoordinatorEntity, RestoreEntity):
+    """Representation of a reading of Xiaomi Air Conditioner Miot device."""
+
+    # Device initialization and registration
+
+    def __init__(self, coordinator, name, hass_key, unique_id):
+        """Initialize the sensor entity."""
+        super().__init__(coordinator)
+        self._name = "%s %s" % (name, SENSOR_PROPS[hass_key]["name"])
+        self._props = SENSOR_PROPS[hass_key]
+        self._unique_id = f"{unique_id}-{hass_key}"
+        self._restored_state = None
+
+    async def async_added_to_hass(self):
+        """Show the value saved before the restart until the first poll."""
+        await super().async_added_to_hass()
+        last_state = await self.async_get_last_state()
+        if last_state is None or last_state.state in (STATE_UNAVAILABLE, STATE_UNKNOWN):
+            return
+        try:
+            self._restored_state = float(last_state.state)
+        except ValueError:
+            pass
+
+    # Implement abstract `Entity` class
+
+    @property
+    def name(self):
+        """Return the name of the device if any."""
+        return self._name
+
+    @property
+    def unique_id(self):
+        """Return an unique ID."""
+        return self._unique_id
+
+    @property
+    def device_info(self):
+        return self.coordinator.entity_device_info
+
+    @property
+    def available(self):
+        """Return true when state is known."""
+        return super().available and self.native_value is not None
+
+    @property
+    def extra_state_attributes(self):
+        """Return the state attributes of the sensor."""
+        return {ATTR_STALE: self.coordinator.data is None}
+
+    @property
+    def icon(self) -> str:
+        return self._props["icon"]
+
+    # Implement `SensorEntity` class
+
+    @property
+    def device_class(self):
+        return self._props["device_class"]
+
+    @property
+    def state_class(self):
+        return self._props["state_class"]
+
+    @property
+    def native_unit_of_measurement(self):
+        return self._props["unit"]
+
+    @property
+    def native_value(self):
+        if self.coordinator.data is None:
+            return self._restored_state
+        return self.coordinator.data.data.get(self._props["key"])
@@ -0,0 +1,142 @@
+"""
+Raw MIoT property services, for properties not mapped to any entity
+"""
+
+import asyncio
+import logging
+
+import homeassistant.helpers.config_validation as cv
+import voluptuous as vol
+from homeassistant.const import ATTR_ENTITY_ID
+from homeassistant.core import SupportsResponse
+from homeassistant.helpers import entity_registry as er
+
+from .const import ATTR_PIID, ATTR_PROPERTIES, ATTR_SIID, ATTR_VALUE, DOMAIN
+
+_LOGGER = logging.getLogger(__name__)
+
+SERVICE_GET_PROPERTIES = "miot_ac_get_properties"
+SERVICE_SET_PROPERTIES = "miot_ac_set_properties"
+
+PROPERTY_SCHEMA = vol.Schema(
+    {
+        vol.Required(ATTR_SIID): cv.positive_int,
+        vol.Required(ATTR_PIID): cv.positive_int,
+    }
+)
+
+PROPERTY_VALUE_SCHEMA = PROPERTY_SCHEMA.extend(
+    {vol.Required(ATTR_VALUE): vol.Any(bool, int, float, str)}
+)
+
+SERVICE_SCHEMA_GET_PROPERTIES = vol.Schema(
+    {
+        vol.Optional(ATTR_ENTITY_ID): cv.entity_ids,
+        vol.Required(ATTR_PROPERTIES): vol.All(cv.ensure_list, [PROPERTY_SCHEMA]),
+    }
+)
+
+SERVICE_SCHEMA_SET_PROPERTIES = vol.Schema(
+    {
+        vol.Optional(ATTR_ENTITY_ID): cv.entity_ids,
+        vol.Required(ATTR_PROPERTIES): vol.All(
+            cv.ensure_list, [PROPERTY_VALUE_SCHEMA]
+        ),
+    }
+)
+
+
+def _devices(hass, entity_ids):
+    """Return {response key: device info} for the targeted devices.
+
+    Any entity of a device selects it, no target selects all devices.
+    Devices are keyed by their climate entity id.
+    """
+    devices = {
+        entry_id: info
+        for entry_id, info in hass.data.get(DOMAIN, {}).items()
+        if isinstance(info, dict) and "transport" in info
+    }
+    if entity_ids:
+        registry = er.async_get(hass)
+        entry_ids = set()
+        for entity_id in entity_ids:
+            entry = registry.async_get(entity_id)
+            if entry is None or entry.config_entry_id not in devices:
+                _LOGGER.warning("%s is not a Xiaomi Miot air conditioner", entity_id)
+                continue
+            entry_ids.add(entry.config_entry_id)
+        devices = {entry_id: devices[entry_id] for entry_id in entry_ids}
+
+    return {
+        info["entity"].entity_id if "entity" in info else info["name"]: info
+        for info in devices.values()
+    }
+
+
+def _payload(properties):
+    return [
+        {"did": f"{prop[ATTR_SIID]}-{prop[ATTR_PIID]}", **prop}
+        for prop in properties
+    ]
+
+
+async def _async_run(devices, func):
+    """Run `func` on every device in parallel, collect results or errors."""
+    keys = list(devices)
+    results = await asyncio.gather(
+        *(func(devices[key]) for key in keys), return_exceptions=True
+    )
+
+    response = {}
+    for key, result in zip(keys, results):
+        if isinstance(result, BaseException):
+            _LOGGER.error("Raw MIoT request to %s failed: %s", key, result)
+            response[key] = {"error": str(result)}
+        else:
+            response[key] = {ATTR_PROPERTIES: result}
+    return response
+
+
+def async_setup_services(hass):
+    """Register the raw property services of the integration."""
+
+    async def async_get_properties(service):
+        """Read the listed properties, one request per device."""
+        properties = _payload(service.data[ATTR_PROPERTIES])
+        return await _async_run(
+            _devices(hass, service.data.get(ATTR_ENTITY_ID)),
+            lambda info: info["transport"].async_read(properties),
+        )
+
+    async def async_set_properties(service):
+        """Write the listed properties, one request per device.
+
+        The write waits its turn in the command queue of the device, so it
+        is spaced from the writes of the entities like they are.
+        """
+        properties = _payload(service.data[ATTR_PROPERTIES])
+
+        async def _async_write(info):
+            result = await info["command_queue"].async_write(properties)
+            await info["coordinator"].async_request_refresh()
+            return result
+
+        return await _async_run(
+            _devices(hass, service.data.get(ATTR_ENTITY_ID)), _async_write
+        )
+
+    hass.services.async_register(
+        DOMAIN,
+        SERVICE_GET_PROPERTIES,
+        async_get_properties,
+        schema=SERVICE_SCHEMA_GET_PROPERTIES,
+        supports_response=SupportsResponse.ONLY,
+    )
+    hass.services.async_register(
+        DOMAIN,
+        SERVICE_SET_PROPERTIES,
+        async_set_properties,
+        schema=SERVICE_SCHEMA_SET_PROPERTIES,
+        supports_response=SupportsResponse.OPTIONAL,
+    )
@@ -3,16 +3,11 @@ Support for Xiaomi Air Conditioner Miot Version
 """
 
 import logging
-from datetime import timedelta
-from functools import partial
 
 from homeassistant.components.switch import SwitchEntity
-from homeassistant.helpers.update_coordinator import (
-    CoordinatorEntity,
-    DataUpdateCoordinator,
-    UpdateFailed,
-)
-from miio import DeviceException
+from homeassistant.const import STATE_ON, STATE_UNAVAILABLE, STATE_UNKNOWN
+from homeassistant.helpers.restore_state import RestoreEntity
+from homeassistant.helpers.update_coordinator import CoordinatorEntity
 
 from .const import (
     ATTR_BUZZER,
@@ -21,6 +16,7 @@ from .const import (
     ATTR_ECO,
     ATTR_LED,
     ATTR_SLEEP_MODE,
+    ATTR_STALE,
     DOMAIN,
 )
 
@@ -31,37 +27,33 @@ SWITCH_PROPS = {
         "name": "buzzer",
         "icon": "mdi:bell-ring",
         "state": "buzzer",
-        "func": "set_buzzer",
     },
     ATTR_CLEAN: {
         "name": "clean mode",
         "icon": "mdi:broom",
         "state": "clean",
-        "func": "set_clean",
+        # Written as "1" or "0", like `AirConditionerMiot.set_clean` does.
+        "encode": lambda on: str(int(on)),
     },
     ATTR_DRYER: {
         "name": "dryer mode",
         "icon": "mdi:water-off",
         "state": "dryer",
-        "func": "set_dryer",
     },
     ATTR_ECO: {
         "name": "eco mode",
         "icon": "mdi:flash",
         "state": "eco",
-        "func": "set_eco",
     },
     ATTR_LED: {
         "name": "LED enabled",
         "icon": "mdi:lightbulb",
         "state": "led",
-        "func": "set_led",
     },
     ATTR_SLEEP_MODE: {
         "name": "sleep mode",
         "icon": "mdi:power-sleep",
         "state": "sleep_mode",
-        "func": "set_sleep_mode",
     },
 }
 
@@ -72,87 +64,57 @@ DEFAULT_RETRIES = 20
 DEFAULT_NAME = "Xiaomi Mi Smart Air Conditioner A"
 
 
-SUCCESS = ["ok"]
-
-SCAN_INTERVAL = timedelta(seconds=60)
+def switch_state(data, hass_key):
+    """Return the state of a switch from a polled device status."""
+    state = getattr(data, SWITCH_PROPS[hass_key]["state"])
+    if hass_key == ATTR_CLEAN:
+        return state.cleaning
+    return state
 
 
 async def async_setup_entry(hass, config_entry, async_add_entities):
     """ Setup one switch entity with config entry forwarded. """
     entry_id = config_entry.entry_id
     config = hass.data[DOMAIN][entry_id]
-    device = config["miot_device"]
+    queue = config["command_queue"]
+    coordinator = config["coordinator"]
     name = config["name"]
-    retries = config["retries"]
     uniq_id = config["unique_id"]
-    device_info = config["device_info"]
-
-    config["switch_data"] = {"retry": 0, "retries": retries}
-
-    async def async_update_data():
-        data = hass.data[DOMAIN][entry_id]["switch_data"]
-        data["retry"] = 0
-        _LOGGER.debug("Updating, retry: " + str(data["retry"]))
-        while data["retry"] < data["retries"]:
-            try:
-                state = await hass.async_add_executor_job(device.status)
-                _LOGGER.debug("Got new state: %s", state)
-                data["retry"] = 0
-                return state
-
-            except DeviceException as ex:
-                data["retry"] = data["retry"] + 1
-                _LOGGER.info(
-                    "Got exception while fetching the state: %s , _retry=%s",
-                    ex,
-                    data["retry"],
-                )
-                if data["retry"] >= data["retries"]:
-                    raise UpdateFailed(
-                        f"Error communicating with air conditioner: {ex}"
-                    )
-
-    coordinator = DataUpdateCoordinator(
-        hass,
-        _LOGGER,
-        name="xiaomi_miot_air_conditioner_switch",
-        update_method=async_update_data,
-        update_interval=SCAN_INTERVAL,
-    )
-
-    await coordinator.async_refresh()
 
     entities = [
-        XiaomiSwitchEntity(coordinator, name, hass_key, device, retries, uniq_id, device_info)
+        XiaomiSwitchEntity(coordinator, name, hass_key, queue, uniq_id)
         for hass_key in SWITCH_PROPS
     ]
 
-    async_add_entities(entities, update_before_add=True)
-
+    async_add_entities(entities)
 
-class AirConditionerMiotException(DeviceException):
-    pass
 
-
-class XiaomiSwitchEntity(SwitchEntity, CoordinatorEntity):
+class XiaomiSwitchEntity(SwitchEntity, CoordinatorEntity, RestoreEntity):
     """Representation of Xiaomi Air Conditioner Miot device."""
 
     # Device initialization and registration
 
-    def __init__(self, coordinator, name, hass_key, device, retries, unique_id, device_info):
+    def __init__(self, coordinator, name, hass_key, queue, unique_id):
         """Initialize the climate entity."""
         super().__init__(coordinator)
         self._name = "%s %s" % (name, SWITCH_PROPS[hass_key]["name"])
         self._icon = SWITCH_PROPS[hass_key]["icon"]
-        self._device = device
-        self._retry = 0
-        self._retries = retries
+        self._queue = queue
         self._hass_key = hass_key
         self._unique_id = f"{unique_id}-{hass_key}"
-        self._identifier = {(DOMAIN, unique_id)}
-        self._device_info = device_info
         self._state_name = SWITCH_PROPS[hass_key]["state"]
-        self._func_name = SWITCH_PROPS[hass_key]["func"]
+        self._encode = SWITCH_PROPS[hass_key].get("encode", bool)
+        self._restored_state = None
+
+    async def async_added_to_hass(self):
+        """Show the state saved before the restart until the first poll."""
+        await super().async_added_to_hass()
+        last_state = await self.async_get_last_state()
+        if last_state is not None and last_state.state not in (
+            STATE_UNAVAILABLE,
+            STATE_UNKNOWN,
+        ):
+            self._restored_state = last_state.state == STATE_ON
 
     # Implement abstract `Entity` class
 
@@ -168,14 +130,19 @@ class XiaomiSwitchEntity(SwitchEntity, CoordinatorEntity):
 
     @property
     def device_info(self):
-        return {
-            "name": self._device_info.model,
-            "manufacturer": "Xiaomi",
-            "model": self._device_info.model,
-            "sw_version": self._device_info.firmware_version,
-            "hw_version": self._device_info.hardware_version,
-            "identifiers": self._identifier,
-        }
+        return self.coordinator.entity_device_info
+
+    @property
+    def available(self):
+        """Return true when state is known."""
+        return super().available and (
+            self.coordinator.data is not None or self._restored_state is not None
+        )
+
+    @property
+    def extra_state_attributes(self):
+        """Return the state attributes of the switch."""
+        return {ATTR_STALE: self.coordinator.data is None}
 
     @property
     def icon(self) -> str:
@@ -183,40 +150,32 @@ class XiaomiSwitchEntity(SwitchEntity, CoordinatorEntity):
 
     @property
     def is_on(self):
-        state = getattr(self.coordinator.data, self._state_name)
-        if self._state_name == SWITCH_PROPS[ATTR_CLEAN]["state"]:
-            return state.cleaning
-        return state
+        if self.coordinator.data is None:
+            return self._restored_state
+        return switch_state(self.coordinator.data, self._hass_key)
 
-    async def _try_command(self, mask_error, func, *args, **kwargs):
-        """Call a miio device command handling error messages."""
+    async def _try_set_property(self, mask_error, value):
+        """Queue a write of this switch's property handling error messages."""
         from miio import DeviceException
 
         try:
-            result = await self.hass.async_add_job(partial(func, *args, **kwargs))
-
-            _LOGGER.debug("Response received from miio device: %s", result)
-
-            return result == SUCCESS
+            result = await self._queue.async_set(self._state_name, self._encode(value))
         except DeviceException as exc:
-            _LOGGER.error(mask_error, exc)
-            self._available = False
+            _LOGGER.error("%s %s", mask_error, exc)
             return False
 
+        if not result:
+            _LOGGER.error("%s The device rejected the value.", mask_error)
+        return result
+
     async def async_turn_on(self, **kwargs):
-        func = getattr(self._device, self._func_name)
-        await self._try_command(
-            "Turning on %s of the device failed." % self._state_name,
-            func,
-            True,
+        await self._try_set_property(
+            "Turning on %s of the device failed." % self._state_name, True
         )
         await self.coordinator.async_request_refresh()
 
     async def async_turn_off(self, **kwargs):
-        func = getattr(self._device, self._func_name)
-        await self._try_command(
-            "Turning off %s of the device failed." % self._state_name,
-            func,
-            False,
+        await self._try_set_property(
+            "Turning off %s of the device failed." % self._state_name, False
         )
         await self.coordinator.async_request_refresh()
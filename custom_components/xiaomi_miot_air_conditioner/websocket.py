@@ -0,0 +1,185 @@
+"""
+Websocket API reading the cached device state, without any device I/O
+"""
+
+from time import time
+
+import homeassistant.helpers.config_validation as cv
+import voluptuous as vol
+from homeassistant.components import websocket_api
+from homeassistant.const import ATTR_ENTITY_ID
+from homeassistant.core import callback
+from homeassistant.helpers.dispatcher import async_dispatcher_connect
+
+from .const import ATTR_STALE, DOMAIN, SIGNAL_DEVICE_UPDATED
+from .switch import SWITCH_PROPS, switch_state
+
+
+def _devices(hass):
+    """Return {config entry id: info} of the set up devices."""
+    return {
+        entry_id: info
+        for entry_id, info in hass.data.get(DOMAIN, {}).items()
+        if isinstance(info, dict) and "coordinator" in info
+    }
+
+
+def _device_snapshot(info):
+    """Return the cached state of one device, as shown by its entities."""
+    coordinator = info["coordinator"]
+    data = coordinator.data
+    entity = info.get("entity")
+
+    climate = None
+    if entity is not None and entity.hass is not None:
+        climate = {
+            "hvac_mode": entity.hvac_mode,
+            "current_temperature": entity.current_temperature,
+            "target_temperature": entity.target_temperature,
+            "fan_mode": entity.fan_mode,
+            "swing_mode": entity.swing_mode,
+            ATTR_STALE: data is None,
+        }
+
+    return {
+        "name": info["name"],
+        "entity_id": entity.entity_id if entity is not None else None,
+        "available": coordinator.last_update_success and data is not None,
+        "last_poll": coordinator.last_poll,
+        "climate": climate,
+        "switches": {}
+        if data is None
+        else {key: switch_state(data, key) for key in SWITCH_PROPS},
+    }
+
+
+def _with_age(snapshot, now):
+    last_poll = snapshot["last_poll"]
+    return {
+        **snapshot,
+        "last_poll_age": None if last_poll is None else round(now - last_poll, 1),
+    }
+
+
+def _device_by_entity_id(hass, entity_id):
+    """Return the info of the device whose climate entity is `entity_id`."""
+    for info in hass.data.get(DOMAIN, {}).values():
+        if (
+            isinstance(info, dict)
+            and "entity" in info
+            and info["entity"].entity_id == entity_id
+        ):
+            return info
+    return None
+
+
+@websocket_api.websocket_command(
+    {
+        vol.Required("type"): f"{DOMAIN}/history",
+        vol.Required(ATTR_ENTITY_ID): cv.entity_id,
+    }
+)
+@callback
+def websocket_history(hass, connection, msg):
+    """Return the buffered samples and rolling statistics of one device."""
+    info = _device_by_entity_id(hass, msg[ATTR_ENTITY_ID])
+    if info is None:
+        connection.send_error(
+            msg["id"], websocket_api.const.ERR_NOT_FOUND, "Unknown climate entity"
+        )
+        return
+
+    history = info["coordinator"].history
+    connection.send_result(
+        msg["id"],
+        {
+            "temperature_trend": history.temperature_slope(),
+            "duty_cycle": history.duty_cycle(),
+            "time_in_mode": history.time_in_mode(),
+            "samples": history.samples(),
+        },
+    )
+
+
+@websocket_api.websocket_command({vol.Required("type"): f"{DOMAIN}/snapshot"})
+@callback
+def websocket_snapshot(hass, connection, msg):
+    """Return the state of every device in a single message."""
+    now = time()
+    connection.send_result(
+        msg["id"],
+        {
+            entry_id: _with_age(_device_snapshot(info), now)
+            for entry_id, info in _devices(hass).items()
+        },
+    )
+
+
+@websocket_api.websocket_command({vol.Required("type"): f"{DOMAIN}/subscribe"})
+@callback
+def websocket_subscribe(hass, connection, msg):
+    """Send a full snapshot, then only what changed, per device and field.
+
+    A removed device is sent as null. Changes are collected until the end
+    of the current loop iteration, so that the entities have handled a new
+    poll before it is read, and several devices updated together go out in
+    one message.
+    """
+    now = time()
+    sent = {
+        entry_id: _device_snapshot(info) for entry_id, info in _devices(hass).items()
+    }
+    pending = set()
+
+    @callback
+    def _async_flush():
+        devices = _devices(hass)
+        now = time()
+        diff = {}
+        for entry_id in pending:
+            if entry_id not in devices:
+                if sent.pop(entry_id, None) is not None:
+                    diff[entry_id] = None
+                continue
+
+            snapshot = _device_snapshot(devices[entry_id])
+            previous = sent.get(entry_id, {})
+            changed = {
+                key: value
+                for key, value in snapshot.items()
+                if previous.get(key) != value
+            }
+            sent[entry_id] = snapshot
+            if changed:
+                if "last_poll" in changed:
+                    changed = _with_age(changed, now)
+                diff[entry_id] = changed
+        pending.clear()
+
+        if diff:
+            connection.send_message(websocket_api.event_message(msg["id"], diff))
+
+    @callback
+    def _async_device_updated(entry_id):
+        if not pending:
+            hass.loop.call_soon(_async_flush)
+        pending.add(entry_id)
+
+    connection.subscriptions[msg["id"]] = async_dispatcher_connect(
+        hass, SIGNAL_DEVICE_UPDATED, _async_device_updated
+    )
+    connection.send_result(msg["id"])
+    connection.send_message(
+        websocket_api.event_message(
+            msg["id"],
+            {entry_id: _with_age(snapshot, now) for entry_id, snapshot in sent.items()},
+        )
+    )
+
+
+@callback
+def async_setup_websocket(hass):
+    """Register the websocket commands of the integration."""
+    websocket_api.async_register_command(hass, websocket_history)
+    websocket_api.async_register_command(hass, websocket_snapshot)
+    websocket_api.async_register_command(hass, websocket_subscribe)
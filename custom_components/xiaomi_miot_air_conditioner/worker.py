@@ -0,0 +1,339 @@
+"""
+Device I/O in worker processes, for very large fleets
+"""
+
+import asyncio
+import itertools
+import logging
+import multiprocessing
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from time import monotonic
+from zlib import crc32
+
+from .miot import (
+    DEFAULT_TIMEOUT,
+    MiotTransport,
+    property_values,
+    send_with_deadline,
+    split_properties,
+    status_requests,
+)
+
+_LOGGER = logging.getLogger(__name__)
+
+# Requests in flight at once in one worker, one per device at most.
+WORKER_THREADS = 32
+
+# Time given to a worker to exit on its own when stopping, in seconds.
+STOP_TIMEOUT = 5
+
+# Messages sent to a worker. Requests are
+# (REQUEST, request id, host, token, command, parameters, timeout);
+# a worker replies (request id, succeeded, result or error message).
+# (EVICT, host, token) drops what a worker keeps for a device.
+REQUEST = "request"
+CANCEL = "cancel"
+EVICT = "evict"
+STOP = "stop"
+
+# Commands reading a whole list of properties, or every property of the
+# device, in one round trip.
+READ = "read"
+STATUS = "status"
+
+
+def _read(device, requests, deadline, cancelled):
+    """Send read requests sharing one deadline. Blocking."""
+    results = []
+    for request in requests:
+        results.extend(
+            send_with_deadline(device, "get_properties", request, deadline, cancelled)
+        )
+    return results
+
+
+def _serve(conn):
+    """Run a worker process until it is told to stop or its pipe closes.
+
+    Each device is owned by one worker, which keeps its python-miio
+    object (and so its handshake) between requests, and sends one request
+    at a time to it.
+    """
+    import miio
+
+    from .protocol import use_fast_protocol
+
+    devices = {}
+    cancels = {}
+    reply_lock = threading.Lock()
+    executor = ThreadPoolExecutor(max_workers=WORKER_THREADS)
+
+    def _reply(request_id, succeeded, value):
+        with reply_lock:
+            conn.send((request_id, succeeded, value))
+
+    def _run(request_id, owned, command, parameters, timeout, cancelled):
+        device, lock, status = owned
+        deadline = monotonic() + timeout
+        try:
+            with lock:
+                if command == STATUS:
+                    result = _read(device, status, deadline, cancelled)
+                elif command == READ:
+                    result = _read(
+                        device, split_properties(parameters), deadline, cancelled
+                    )
+                else:
+                    result = send_with_deadline(
+                        device, command, parameters, deadline, cancelled
+                    )
+        except Exception as ex:  # pylint: disable=broad-except
+            # Exceptions of python-miio do not all survive pickling.
+            _reply(request_id, False, str(ex) or type(ex).__name__)
+        else:
+            _reply(request_id, True, result)
+        finally:
+            cancels.pop(request_id, None)
+
+    while True:
+        try:
+            message = conn.recv()
+        except (EOFError, OSError):
+            break
+
+        if message[0] == STOP:
+            break
+        if message[0] == CANCEL:
+            cancelled = cancels.get(message[1])
+            if cancelled is not None:
+                cancelled.set()
+            continue
+        if message[0] == EVICT:
+            # Requests in flight keep their own reference to the device.
+            devices.pop((message[1], message[2]), None)
+            continue
+
+        _, request_id, host, token, command, parameters, timeout = message
+        owned = devices.get((host, token))
+        if owned is None:
+            try:
+                device = use_fast_protocol(miio.AirConditionerMiot(host, token))
+                owned = (device, threading.Lock(), status_requests(device))
+            except Exception as ex:  # pylint: disable=broad-except
+                # e.g. a malformed token: fail this device, not the worker.
+                _reply(request_id, False, str(ex) or type(ex).__name__)
+                continue
+            devices[(host, token)] = owned
+        cancels[request_id] = cancelled = threading.Event()
+        executor.submit(
+            _run,
+            request_id,
+            owned,
+            command,
+            parameters,
+            timeout,
+            cancelled,
+        )
+
+    for cancelled in list(cancels.values()):
+        cancelled.set()
+    executor.shutdown(wait=False)
+    conn.close()
+
+
+class _Worker:
+    """One worker process and the parent's end of its pipe."""
+
+    def __init__(self, index):
+        context = multiprocessing.get_context("spawn")
+        self.conn, child = context.Pipe()
+        self.process = context.Process(
+            target=_serve,
+            args=(child,),
+            name=f"xiaomi_miot_worker_{index}",
+            daemon=True,
+        )
+        self.process.start()
+        child.close()
+        self.pending = set()
+        self.exited = False
+
+    def stop(self):
+        """Ask the process to exit, kill it if it does not. Blocking."""
+        try:
+            self.conn.send((STOP,))
+        except OSError:
+            pass
+        self.process.join(STOP_TIMEOUT)
+        if self.process.is_alive():
+            self.process.kill()
+            self.process.join()
+        self.conn.close()
+
+
+class WorkerPool:
+    """Worker processes doing the device I/O of every config entry.
+
+    The encryption and socket handling of python-miio then compete for
+    the GIL of the workers instead of Home Assistant's. Devices are spread
+    over the workers by host, each request and its result is one message
+    on the worker's pipe, and a worker which died is started again on the
+    next request for one of its devices.
+    """
+
+    def __init__(self, hass, size):
+        self._hass = hass
+        self._workers = [None] * size
+        self._lock = asyncio.Lock()
+        self._ids = itertools.count()
+        # request id -> future of its result
+        self._pending = {}
+
+    def _index(self, host):
+        return crc32(host.encode()) % len(self._workers)
+
+    async def _async_worker(self, host):
+        index = self._index(host)
+        async with self._lock:
+            worker = self._workers[index]
+            if worker is None or worker.exited:
+                worker = await self._hass.async_add_executor_job(_Worker, index)
+                self._workers[index] = worker
+                threading.Thread(
+                    target=self._receive,
+                    args=(worker,),
+                    name=f"xiaomi_miot_worker_{index}_receive",
+                    daemon=True,
+                ).start()
+        return worker
+
+    def _receive(self, worker):
+        """Hand the results of a worker to the event loop. Runs in a thread."""
+        loop = self._hass.loop
+        while True:
+            try:
+                request_id, succeeded, value = worker.conn.recv()
+            except (EOFError, OSError):
+                break
+            loop.call_soon_threadsafe(self._resolve, request_id, succeeded, value)
+        loop.call_soon_threadsafe(self._exited, worker)
+
+    def _resolve(self, request_id, succeeded, value):
+        future = self._pending.pop(request_id, None)
+        if future is not None and not future.done():
+            future.set_result((succeeded, value))
+
+    def _exited(self, worker):
+        if worker.exited:
+            return
+        worker.exited = True
+        if worker.pending:
+            _LOGGER.warning(
+                "Worker %s exited with %s requests pending",
+                worker.process.name,
+                len(worker.pending),
+            )
+        for request_id in worker.pending:
+            self._resolve(request_id, False, "worker exited")
+        worker.pending.clear()
+
+    async def async_call(self, host, token, command, parameters, timeout):
+        """Run a command for a device in its worker, return the result."""
+        from miio import DeviceException
+
+        worker = await self._async_worker(host)
+        request_id = next(self._ids)
+        future = self._hass.loop.create_future()
+        self._pending[request_id] = future
+        worker.pending.add(request_id)
+        try:
+            worker.conn.send(
+                (REQUEST, request_id, host, token, command, parameters, timeout)
+            )
+            succeeded, value = await future
+        except asyncio.CancelledError:
+            if not worker.exited:
+                try:
+                    worker.conn.send((CANCEL, request_id))
+                except OSError:
+                    # The worker is gone, and the request with it.
+                    pass
+            raise
+        except OSError as ex:
+            raise DeviceException(f"{command} failed: {ex}") from ex
+        finally:
+            self._pending.pop(request_id, None)
+            worker.pending.discard(request_id)
+
+        if not succeeded:
+            raise DeviceException(value)
+        return value
+
+    def async_evict(self, host, token):
+        """Make the worker of a device forget it, when its entry unloads."""
+        worker = self._workers[self._index(host)]
+        if worker is None or worker.exited:
+            return
+        try:
+            worker.conn.send((EVICT, host, token))
+        except OSError:
+            pass
+
+    async def async_stop(self, *_):
+        """Stop every worker."""
+        workers = [worker for worker in self._workers if worker is not None]
+        self._workers = [None] * len(self._workers)
+        for worker in workers:
+            self._exited(worker)
+        await asyncio.gather(
+            *(self._hass.async_add_executor_job(worker.stop) for worker in workers)
+        )
+
+
+class WorkerTransport(MiotTransport):
+    """Access to one device through the worker pool.
+
+    Same interface as `MiotTransport`, so nothing above it changes. A
+    whole property list, or the status, is read in a single round trip to
+    the worker.
+    """
+
+    def __init__(self, hass, device, pool, host, token, timeout=DEFAULT_TIMEOUT):
+        super().__init__(hass, device, timeout)
+        self._pool = pool
+        self._host = host
+        self._token = token
+
+    async def async_send(self, command, parameters=None, timeout=None):
+        """Send a command to the device within `timeout` seconds."""
+        return await self._pool.async_call(
+            self._host,
+            self._token,
+            command,
+            parameters,
+            self._timeout if timeout is None else timeout,
+        )
+
+    async def async_read(self, properties, timeout=None):
+        """Read a list of {did, siid, piid} entries, return the raw results."""
+        return await self._pool.async_call(
+            self._host,
+            self._token,
+            READ,
+            properties,
+            self._timeout if timeout is None else timeout,
+        )
+
+    async def async_status(self, timeout=None):
+        """Read the status of the device, like `AirConditionerMiot.status`."""
+        from miio.airconditioner_miot import AirConditionerMiotStatus
+
+        results = await self._pool.async_call(
+            self._host,
+            self._token,
+            STATUS,
+            None,
+            self._timeout if timeout is None else timeout,
+        )
+        return AirConditionerMiotStatus(property_values(results))
@@ -0,0 +1 @@
+"""Tests of the Xiaomi Miot Air Conditioner integration."""
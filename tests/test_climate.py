@@ -0,0 +1,13 @@
+"""Tests of the climate helpers."""
+
+import pytest
+
+from custom_components.xiaomi_miot_air_conditioner.climate import _round_temperature
+
+
+@pytest.mark.parametrize(
+    "temperature, expected",
+    [(22.2, 22), (22.3, 22.5), (22.8, 23), (10, 16), (15.9, 16), (35, 31)],
+)
+def test_round_temperature_to_the_device_step_and_range(temperature, expected):
+    assert _round_temperature(temperature) == expected
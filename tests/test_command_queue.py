@@ -0,0 +1,151 @@
+"""Tests of the per-device queue of property writes."""
+
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+from miio import DeviceException
+
+from custom_components.xiaomi_miot_air_conditioner.command_queue import CommandQueue
+
+
+class FakeTransport:
+    """Transport recording the batches it is asked to write."""
+
+    def __init__(self, result=True, delay=0):
+        self.batches = []
+        self.result = result
+        self.delay = delay
+
+    async def async_set_properties(self, props):
+        self.batches.append(props)
+        await asyncio.sleep(self.delay)
+        if isinstance(self.result, Exception):
+            raise self.result
+        return self.result
+
+    async def async_write(self, properties):
+        self.batches.append(properties)
+        return [{**prop, "code": 0} for prop in properties]
+
+
+def run(test, transport, interval=0):
+    """Run `test(queue)` on a queue of `transport` in a new event loop."""
+
+    async def _run():
+        loop = asyncio.get_running_loop()
+        hass = SimpleNamespace(loop=loop, async_create_task=loop.create_task)
+        return await test(CommandQueue(hass, transport, interval))
+
+    return asyncio.run(_run())
+
+
+def test_writes_are_collapsed_into_one_batch():
+    transport = FakeTransport()
+
+    async def test(queue):
+        return await asyncio.gather(
+            queue.async_set("target_temperature", 22),
+            queue.async_set("fan_speed", 2),
+            queue.async_set("target_temperature", 24),
+        )
+
+    assert run(test, transport) == [True, True, True]
+    # Last write wins, and moves behind the other pending properties.
+    assert transport.batches == [{"fan_speed": 2, "target_temperature": 24}]
+    assert list(transport.batches[0]) == ["fan_speed", "target_temperature"]
+
+
+def test_writes_during_a_request_go_in_the_next_batch():
+    transport = FakeTransport(delay=0.05)
+
+    async def test(queue):
+        first = asyncio.ensure_future(queue.async_set("power", True))
+        await asyncio.sleep(0.01)
+        await asyncio.gather(
+            first,
+            queue.async_set("mode", 2),
+            queue.async_set_many({"fan_speed": 1, "heater": False}),
+        )
+
+    run(test, transport)
+    assert transport.batches == [
+        {"power": True},
+        {"mode": 2, "fan_speed": 1, "heater": False},
+    ]
+
+
+def test_raw_writes_are_sent_alone_in_turn():
+    transport = FakeTransport(delay=0.05)
+    raw = [{"did": "2-9", "siid": 2, "piid": 9, "value": 1}]
+
+    async def test(queue):
+        first = asyncio.ensure_future(queue.async_set("power", True))
+        await asyncio.sleep(0.01)
+        results = await asyncio.gather(
+            queue.async_set("mode", 2),
+            queue.async_write(raw),
+            queue.async_write(raw),
+            queue.async_set("fan_speed", 1),
+            first,
+        )
+        return results[1]
+
+    assert run(test, transport) == [{**raw[0], "code": 0}]
+    assert transport.batches == [
+        {"power": True},
+        {"mode": 2},
+        raw,
+        raw,
+        {"fan_speed": 1},
+    ]
+
+
+def test_batches_are_spaced_by_the_interval():
+    transport = FakeTransport()
+
+    async def test(queue):
+        loop = asyncio.get_running_loop()
+        await queue.async_set("power", True)
+        started = loop.time()
+        await queue.async_set("mode", 2)
+        return loop.time() - started
+
+    assert run(test, transport, interval=0.1) >= 0.09
+
+
+def test_failure_is_raised_to_every_writer():
+    transport = FakeTransport(DeviceException("No response from the device"))
+
+    async def test(queue):
+        return await asyncio.gather(
+            queue.async_set("power", True),
+            queue.async_set("mode", 2),
+            return_exceptions=True,
+        )
+
+    results = run(test, transport)
+    assert all(isinstance(result, DeviceException) for result in results)
+    assert len(transport.batches) == 1
+
+
+def test_rejected_write_returns_false():
+    transport = FakeTransport(False)
+    assert run(lambda queue: queue.async_set("power", True), transport) is False
+
+
+def test_cancel_drops_pending_writes():
+    transport = FakeTransport(delay=0.05)
+
+    async def test(queue):
+        first = asyncio.ensure_future(queue.async_set("power", True))
+        await asyncio.sleep(0.01)
+        second = asyncio.ensure_future(queue.async_set("mode", 2))
+        await asyncio.sleep(0)
+        queue.async_cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await second
+        first.cancel()
+
+    run(test, transport)
+    assert transport.batches == [{"power": True}]
@@ -0,0 +1,59 @@
+"""Tests of the setpoint control from an external sensor."""
+
+import pytest
+
+from custom_components.xiaomi_miot_air_conditioner import control
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    """Let the tests move the time seen by the controller."""
+    now = [1000.0]
+    monkeypatch.setattr(control, "monotonic", lambda: now[0])
+    return now
+
+
+def controller():
+    return control.SetpointController(0.5, 16, 31, 0.5, 300)
+
+
+def test_quantize_rounds_to_the_step_and_clamps():
+    assert control.quantize(22.3, 0.5, 16, 31) == 22.5
+    assert control.quantize(10, 0.5, 16, 31) == 16
+    assert control.quantize(40, 0.5, 16, 31) == 31
+
+
+def test_nothing_is_sent_without_readings(clock):
+    assert controller().update(None, 21, 24) is None
+    assert controller().update(24, None, 24) is None
+
+
+def test_unknown_device_setpoint_starts_at_the_desired_one(clock):
+    assert controller().update(23.2, 25, None) == 23.0
+
+
+def test_setpoint_moves_by_the_room_error(clock):
+    # Room 2 degrees too warm: cool harder.
+    assert controller().update(22, 24, 22) == 20
+
+
+def test_error_within_hysteresis_is_ignored(clock):
+    assert controller().update(22, 22.3, 22) is None
+
+
+def test_changes_wait_for_the_dwell_time(clock):
+    setpoints = controller()
+    assert setpoints.update(22, 24, 22) == 20
+    clock[0] += 60
+    assert setpoints.update(22, 23, 20) is None
+    clock[0] += 300
+    assert setpoints.update(22, 23, 20) == 19
+
+
+def test_force_skips_hysteresis_and_dwell(clock):
+    setpoints = controller()
+    assert setpoints.update(22, 24, 22) == 20
+    # Within the dwell time, a new desired temperature goes out at once.
+    assert setpoints.update(25, 24, 20, force=True) == 21
+    # Within the hysteresis, but a half degree step away.
+    assert setpoints.update(22, 21.6, 21, force=True) == 21.5
@@ -0,0 +1,86 @@
+"""Tests of the in-memory history of polled values."""
+
+from miio.airconditioner_miot import AirConditionerMiotStatus, OperationMode
+
+from custom_components.xiaomi_miot_air_conditioner.history import StateHistory
+
+
+def status(temperature=20.0, is_on=True, mode=OperationMode.Cool.value):
+    return AirConditionerMiotStatus(
+        {
+            "power": is_on,
+            "mode": mode,
+            "temperature": temperature,
+            "target_temperature": 24.0,
+            "fan_speed_percent": 50,
+        }
+    )
+
+
+def test_empty_history():
+    history = StateHistory()
+    assert len(history) == 0
+    assert history.temperature_slope() is None
+    assert history.duty_cycle() is None
+    assert history.time_in_mode() is None
+    assert history.samples() == []
+
+
+def test_temperature_slope_in_degrees_per_hour():
+    history = StateHistory()
+    for minute in range(10):
+        history.add(1000 + minute * 60, status(20 + minute * 0.1))
+    assert history.temperature_slope() == 6.0
+
+
+def test_samples_without_temperature_are_left_out_of_the_slope():
+    history = StateHistory()
+    history.add(0, status(20.0))
+    history.add(60, status(None))
+    history.add(120, status(21.0))
+    assert history.temperature_slope() == 30.0
+    assert history.samples()[1]["temperature"] is None
+
+
+def test_oldest_samples_leave_the_buffer():
+    history = StateHistory(size=3)
+    for minute in range(5):
+        history.add(minute * 60, status(20 + minute, is_on=minute >= 3))
+    assert len(history) == 3
+    assert [sample["time"] for sample in history.samples()] == [120, 180, 240]
+    # The sums only cover what is left: one degree per minute, 2 of 3 on.
+    assert history.temperature_slope() == 60.0
+    assert history.duty_cycle() == 0.667
+
+
+def test_time_in_mode_restarts_on_a_mode_change():
+    history = StateHistory()
+    history.add(0, status())
+    history.add(60, status())
+    history.add(120, status(mode=OperationMode.Heat.value))
+    history.add(300, status(mode=OperationMode.Heat.value))
+    assert history.time_in_mode() == 180
+
+
+def test_off_is_a_mode_of_its_own():
+    history = StateHistory()
+    history.add(0, status())
+    history.add(60, status(is_on=False))
+    history.add(90, status(is_on=False))
+    assert history.time_in_mode() == 30
+
+
+def test_property_the_device_failed_to_report():
+    history = StateHistory()
+    history.add(0, status(mode=None))
+    assert history.samples()[0]["mode"] == 0
+
+
+def test_slope_stays_exact_after_the_buffer_wrapped_many_times():
+    history = StateHistory(size=10)
+    start = 1_700_000_000
+    for minute in range(100_000):
+        history.add(start + minute * 60, status(20 + (minute % 2) * 0.5))
+    for minute in range(100_000, 100_010):
+        history.add(start + minute * 60, status(20 + (minute - 100_000) * 0.1))
+    assert history.temperature_slope() == 6.0
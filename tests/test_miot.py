@@ -0,0 +1,154 @@
+"""Tests of the deadline-bound device requests and batched writes."""
+
+import asyncio
+import threading
+from time import monotonic
+from types import SimpleNamespace
+
+import pytest
+from miio import DeviceException
+from miio.exceptions import DeviceError, RecoverableError
+from miio.miioprotocol import MiIOProtocol
+
+from custom_components.xiaomi_miot_air_conditioner import miot
+
+
+def no_response():
+    """Return the exception python-miio raises when a reply timed out."""
+    try:
+        try:
+            raise TimeoutError("timed out")
+        except OSError as ex:
+            raise DeviceException("No response from the device") from ex
+    except DeviceException as ex:
+        return ex
+
+
+class FakeDevice:
+    """Device whose attempts fail with the given exceptions, then succeed."""
+
+    def __init__(self, *failures, discovered=True):
+        self._protocol = SimpleNamespace(
+            ip="192.0.2.1", _timeout=5, _discovered=discovered
+        )
+        self.failures = list(failures)
+        self.attempts = 0
+
+    def send(self, command, parameters=None, retry_count=None):
+        assert retry_count == 0
+        self.attempts += 1
+        if self.failures:
+            raise self.failures.pop(0)
+        return ["ok"]
+
+
+def send(device, timeout=2, cancelled=None):
+    return miot.send_with_deadline(
+        device,
+        "set_properties",
+        [],
+        monotonic() + timeout,
+        cancelled or threading.Event(),
+    )
+
+
+@pytest.fixture(autouse=True)
+def no_pause(monkeypatch):
+    monkeypatch.setattr(miot, "RETRY_DELAY", 0.01)
+
+
+@pytest.fixture(autouse=True)
+def handshakes(monkeypatch):
+    """Answer handshakes at once, return the timeouts they were given."""
+    timeouts = []
+    header = SimpleNamespace(device_id=b"\x01\x02\x03\x04", ts=0)
+
+    def discover(addr, timeout=5):
+        timeouts.append(timeout)
+        return SimpleNamespace(header=SimpleNamespace(value=header))
+
+    monkeypatch.setattr(MiIOProtocol, "discover", staticmethod(discover))
+    return timeouts
+
+
+def test_error_reply_is_not_retried():
+    device = FakeDevice(DeviceError({"code": -5001, "message": "invalid arg"}))
+    with pytest.raises(DeviceError):
+        send(device)
+    assert device.attempts == 1
+
+
+def test_missing_reply_is_retried(handshakes):
+    device = FakeDevice(no_response(), no_response())
+    assert send(device) == ["ok"]
+    assert device.attempts == 3
+    # As python-miio does, each retry starts with a handshake.
+    assert len(handshakes) == 2
+
+
+def test_recoverable_error_is_retried():
+    device = FakeDevice(RecoverableError({"code": -9999, "message": "busy"}))
+    assert send(device) == ["ok"]
+    assert device.attempts == 2
+
+
+def test_retries_are_paced(monkeypatch):
+    monkeypatch.setattr(miot, "RETRY_DELAY", 0.1)
+    device = FakeDevice(*[no_response()] * 100)
+    with pytest.raises(DeviceException):
+        send(device, timeout=0.35)
+    assert device.attempts <= 4
+
+
+def test_cancelled_before_sending():
+    cancelled = threading.Event()
+    cancelled.set()
+    device = FakeDevice()
+    with pytest.raises(DeviceException):
+        send(device, cancelled=cancelled)
+    assert device.attempts == 0
+
+
+def test_handshake_is_bounded_by_the_deadline(monkeypatch):
+    timeouts = []
+
+    def discover(addr, timeout=5):
+        timeouts.append(timeout)
+
+    monkeypatch.setattr(MiIOProtocol, "discover", staticmethod(discover))
+    device = FakeDevice(discovered=False)
+    started = monotonic()
+    with pytest.raises(DeviceException):
+        send(device, timeout=0.2)
+    assert monotonic() - started < 1
+    assert timeouts and all(timeout <= 0.2 for timeout in timeouts)
+    assert device.attempts == 0
+
+
+def test_handshake_before_sending():
+    device = FakeDevice(discovered=False)
+    assert send(device) == ["ok"]
+    assert device._protocol._discovered
+    assert device._protocol._device_id == b"\x01\x02\x03\x04"
+
+
+def test_fan_out_sorts_members_by_result():
+    async def accepted():
+        return True
+
+    async def rejected():
+        return False
+
+    async def failed():
+        raise DeviceException("No response from the device")
+
+    async def cancelled():
+        raise asyncio.CancelledError
+
+    targets = {
+        "a": accepted(),
+        "b": rejected(),
+        "c": failed(),
+        "d": cancelled(),
+    }
+    assert asyncio.run(miot.async_fan_out(targets)) == (["a"], ["b", "c", "d"])
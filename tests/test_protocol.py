@@ -0,0 +1,71 @@
+"""Tests of the per-device packet encoding."""
+
+import datetime
+import socket
+import threading
+
+import pytest
+from miio import DeviceException
+from miio.protocol import Message
+
+from custom_components.xiaomi_miot_air_conditioner.protocol import FastProtocol
+
+TOKEN = "00112233445566778899aabbccddeeff"
+DEVICE_ID = b"\x0a\x1b\x2c\x3d"
+TS = datetime.datetime(2024, 1, 1)
+
+
+@pytest.fixture
+def device():
+    """Local UDP device answering each request with the given reply id."""
+    sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    sock.bind(("127.0.0.1", 0))
+    received = []
+    reply_ids = []
+
+    def serve():
+        token = bytes.fromhex(TOKEN)
+        while True:
+            try:
+                packet, addr = sock.recvfrom(4096)
+            except OSError:
+                return
+            request = Message.parse(packet, token=token).data.value
+            received.append(request["id"])
+            if not reply_ids:
+                continue
+            header = {"length": 0, "unknown": 0, "device_id": DEVICE_ID, "ts": TS}
+            reply = {"id": reply_ids.pop(0), "result": ["ok"]}
+            message = {"data": {"value": reply}, "header": {"value": header}}
+            sock.sendto(Message.build({**message, "checksum": 0}, token=token), addr)
+
+    thread = threading.Thread(target=serve, daemon=True)
+    thread.start()
+
+    protocol = FastProtocol("127.0.0.1", TOKEN, timeout=0.2)
+    protocol.port = sock.getsockname()[1]
+    protocol._discovered = True
+    protocol._device_id = DEVICE_ID
+    protocol._device_ts = TS
+    yield protocol, received, reply_ids
+    sock.close()
+
+
+def test_id_follows_the_reply(device):
+    protocol, received, reply_ids = device
+    reply_ids.extend([500, 501])
+    assert protocol.send("get_properties", [], retry_count=0) == ["ok"]
+    assert protocol.send("get_properties", [], retry_count=0) == ["ok"]
+    assert received == [1, 501]
+
+
+def test_id_skips_ahead_after_a_missing_reply(device):
+    protocol, received, reply_ids = device
+    with pytest.raises(DeviceException):
+        protocol.send("get_properties", [], retry_count=0)
+    assert not protocol._discovered
+
+    protocol._discovered = True
+    reply_ids.append(102)
+    assert protocol.send("get_properties", [], retry_count=0) == ["ok"]
+    assert received == [1, 102]
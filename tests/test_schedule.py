@@ -0,0 +1,164 @@
+"""Tests of the weekly programs pushed to the device timer."""
+
+import asyncio
+from datetime import datetime, time, timezone
+from types import SimpleNamespace
+
+import pytest
+from homeassistant.const import CONF_ENTITIES, CONF_NAME, WEEKDAYS
+from miio.airconditioner_miot import TimerStatus
+
+from custom_components.xiaomi_miot_air_conditioner import schedule
+from custom_components.xiaomi_miot_air_conditioner.const import (
+    ATTR_TEMPERATURE,
+    CONF_AT,
+    CONF_DAYS,
+    CONF_HVAC_MODE,
+    CONF_PROGRAM,
+)
+
+# A Monday.
+NOW = datetime(2024, 1, 1, 12, 0, tzinfo=timezone.utc)
+
+PROGRAM = [
+    {CONF_DAYS: WEEKDAYS, CONF_AT: time(7, 0), CONF_HVAC_MODE: "heat"},
+    {
+        CONF_DAYS: ["mon", "tue", "wed", "thu", "fri"],
+        CONF_AT: time(12, 30),
+        CONF_HVAC_MODE: "cool",
+        ATTR_TEMPERATURE: 24,
+    },
+    {CONF_DAYS: WEEKDAYS, CONF_AT: time(22, 0), CONF_HVAC_MODE: "off"},
+]
+
+
+class FakeEntity:
+    """Climate entity recording what the engine pushes."""
+
+    entity_id = "climate.living_room"
+
+    def __init__(self):
+        self.calls = []
+
+    async def async_preset(self, hvac_mode, temperature):
+        self.calls.append(("preset", hvac_mode, temperature))
+
+    async def async_set_delay_on_timer(self, minutes):
+        self.calls.append(("delay_on", minutes))
+
+    async def async_set_delay_off_timer(self, minutes):
+        self.calls.append(("delay_off", minutes))
+
+
+def state(is_on, timer="0,0,0,0"):
+    return SimpleNamespace(is_on=is_on, timer=TimerStatus(timer))
+
+
+def engine(program=PROGRAM):
+    return schedule.ScheduleEngine(
+        None,
+        [
+            {
+                CONF_NAME: "week",
+                CONF_ENTITIES: [FakeEntity.entity_id],
+                CONF_PROGRAM: program,
+            }
+        ],
+    )
+
+
+@pytest.fixture(autouse=True)
+def now(monkeypatch):
+    monkeypatch.setattr(schedule.dt_util, "now", lambda: NOW)
+
+
+def test_next_transition_later_today():
+    transition = schedule.next_transition(PROGRAM, NOW)
+    assert transition == schedule.Transition(
+        datetime(2024, 1, 1, 12, 30, tzinfo=timezone.utc), "cool", 24
+    )
+
+
+def test_next_transition_skips_days_not_in_the_step():
+    saturday = datetime(2024, 1, 6, 12, 0, tzinfo=timezone.utc)
+    transition = schedule.next_transition(PROGRAM, saturday)
+    assert transition.when == datetime(2024, 1, 6, 22, 0, tzinfo=timezone.utc)
+
+
+def test_next_transition_wraps_to_next_week():
+    program = [{CONF_DAYS: ["mon"], CONF_AT: time(12, 0), CONF_HVAC_MODE: "off"}]
+    transition = schedule.next_transition(program, NOW)
+    assert transition.when == datetime(2024, 1, 8, 12, 0, tzinfo=timezone.utc)
+
+
+def test_next_transition_of_empty_program():
+    assert schedule.next_transition([], NOW) is None
+
+
+def test_turn_on_is_pushed_as_preset_and_delay_on_timer():
+    entity = FakeEntity()
+    asyncio.run(engine().async_reconcile(entity, state(False)))
+    assert entity.calls == [("preset", "cool", 24), ("delay_on", 30)]
+
+
+def test_armed_timer_is_not_pushed_again():
+    entity = FakeEntity()
+    schedules = engine()
+    asyncio.run(schedules.async_reconcile(entity, state(False)))
+    entity.calls.clear()
+
+    asyncio.run(schedules.async_reconcile(entity, state(False, "1,30,1,29")))
+    assert entity.calls == []
+
+
+@pytest.mark.parametrize(
+    "timer",
+    [
+        # Cancelled by the remote.
+        "0,0,0,0",
+        # Set to turn the unit off instead.
+        "1,30,0,29",
+        # Set for another time.
+        "1,120,1,95",
+    ],
+)
+def test_lost_timer_is_pushed_again(timer):
+    entity = FakeEntity()
+    schedules = engine()
+    asyncio.run(schedules.async_reconcile(entity, state(False)))
+    entity.calls.clear()
+
+    asyncio.run(schedules.async_reconcile(entity, state(False, timer)))
+    assert entity.calls == [("preset", "cool", 24), ("delay_on", 30)]
+
+
+def test_turn_off_is_pushed_as_delay_off_timer():
+    program = [{CONF_DAYS: WEEKDAYS, CONF_AT: time(13, 0), CONF_HVAC_MODE: "off"}]
+    entity = FakeEntity()
+    asyncio.run(engine(program).async_reconcile(entity, state(True)))
+    assert entity.calls == [("delay_off", 60)]
+
+
+def test_turn_off_of_a_unit_already_off():
+    program = [{CONF_DAYS: WEEKDAYS, CONF_AT: time(13, 0), CONF_HVAC_MODE: "off"}]
+    entity = FakeEntity()
+    asyncio.run(engine(program).async_reconcile(entity, state(False)))
+    assert entity.calls == []
+
+
+def test_transition_beyond_the_timer_range():
+    program = [{CONF_DAYS: ["tue"], CONF_AT: time(12, 0), CONF_HVAC_MODE: "off"}]
+    entity = FakeEntity()
+    asyncio.run(engine(program).async_reconcile(entity, state(True)))
+    assert entity.calls == []
+
+
+def test_unknown_timer_is_not_armed():
+    status = SimpleNamespace(is_on=False)
+    assert not schedule.timer_armed(status, True, 30)
+
+
+def test_only_units_of_a_schedule_are_scheduled():
+    schedules = engine()
+    assert schedules.is_scheduled(FakeEntity.entity_id)
+    assert not schedules.is_scheduled("climate.bedroom")
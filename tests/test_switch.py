@@ -0,0 +1,44 @@
+"""Tests of the switch property writes."""
+
+import asyncio
+from types import SimpleNamespace
+
+from custom_components.xiaomi_miot_air_conditioner.const import ATTR_CLEAN, ATTR_LED
+from custom_components.xiaomi_miot_air_conditioner.switch import XiaomiSwitchEntity
+
+
+class FakeQueue:
+    """Command queue recording the writes it is given."""
+
+    def __init__(self, result=True):
+        self.writes = []
+        self.result = result
+
+    async def async_set(self, key, value):
+        self.writes.append((key, value))
+        return self.result
+
+
+def switch(hass_key, queue):
+    coordinator = SimpleNamespace(data=None)
+    return XiaomiSwitchEntity(coordinator, "AC", hass_key, queue, "ac")
+
+
+def test_clean_is_written_as_a_string():
+    queue = FakeQueue()
+    entity = switch(ATTR_CLEAN, queue)
+    asyncio.run(entity._try_set_property("", True))
+    asyncio.run(entity._try_set_property("", False))
+    assert queue.writes == [("clean", "1"), ("clean", "0")]
+
+
+def test_other_switches_are_written_as_bools():
+    queue = FakeQueue()
+    asyncio.run(switch(ATTR_LED, queue)._try_set_property("", True))
+    assert queue.writes == [("led", True)]
+
+
+def test_rejected_write_is_logged(caplog):
+    entity = switch(ATTR_LED, FakeQueue(False))
+    assert not asyncio.run(entity._try_set_property("Turning on led failed.", True))
+    assert "Turning on led failed. The device rejected the value." in caplog.text
@@ -0,0 +1,151 @@
+"""Tests of the worker pool, with workers run in threads of the test."""
+
+import asyncio
+import multiprocessing
+import threading
+from types import SimpleNamespace
+
+import pytest
+from miio import DeviceException
+
+from custom_components.xiaomi_miot_air_conditioner import worker
+
+TOKEN = "00112233445566778899aabbccddeeff"
+
+
+class ThreadWorker(worker._Worker):
+    """`_Worker` serving its pipe from a thread instead of a process."""
+
+    def __init__(self, index):
+        self.conn, child = multiprocessing.Pipe()
+        self.process = threading.Thread(
+            target=worker._serve, args=(child,), name=f"worker_{index}", daemon=True
+        )
+        self.process.start()
+        self.pending = set()
+        self.exited = False
+
+
+@pytest.fixture
+def devices(monkeypatch):
+    """Answer every request with the index of the device object it went to.
+
+    "block" waits to be cancelled, then records it.
+    """
+    seen = []
+    cancelled_requests = threading.Event()
+
+    def send(device, command, parameters, deadline, cancelled):
+        if command == "block":
+            if cancelled.wait(5):
+                cancelled_requests.set()
+            raise DeviceException("cancelled")
+        if device not in seen:
+            seen.append(device)
+        return seen.index(device)
+
+    monkeypatch.setattr(worker, "_Worker", ThreadWorker)
+    monkeypatch.setattr(worker, "send_with_deadline", send)
+    return SimpleNamespace(seen=seen, cancelled=cancelled_requests)
+
+
+def run(test, size=1):
+    """Run `test(pool)` on a worker pool in a new event loop."""
+
+    async def _run():
+        loop = asyncio.get_running_loop()
+        hass = SimpleNamespace(
+            loop=loop,
+            async_add_executor_job=lambda func, *args: loop.run_in_executor(
+                None, func, *args
+            ),
+        )
+        pool = worker.WorkerPool(hass, size)
+        try:
+            return await test(pool)
+        finally:
+            await pool.async_stop()
+
+    return asyncio.run(_run())
+
+
+def call(pool, command="get_prop", host="192.0.2.1", token=TOKEN):
+    # Bounded, so a worker which stopped answering fails the test.
+    return asyncio.wait_for(pool.async_call(host, token, command, [], 1), 5)
+
+
+def test_device_is_kept_between_requests(devices):
+    async def test(pool):
+        return [
+            await call(pool),
+            await call(pool),
+            await call(pool, host="192.0.2.2"),
+        ]
+
+    assert run(test) == [0, 0, 1]
+
+
+def test_evicted_device_is_created_again(devices):
+    async def test(pool):
+        first = await call(pool)
+        pool.async_evict("192.0.2.1", TOKEN)
+        return first, await call(pool)
+
+    assert run(test) == (0, 1)
+
+
+def test_malformed_token_fails_only_its_request(devices):
+    async def test(pool):
+        await call(pool)
+        alive = pool._workers[0]
+        with pytest.raises(DeviceException, match="non-hexadecimal"):
+            await call(pool, token="not a token")
+        assert await call(pool) == 0
+        return pool._workers[0] is alive and not alive.exited
+
+    assert run(test)
+
+
+def test_cancel_reaches_the_worker(devices):
+    async def test(pool):
+        task = asyncio.ensure_future(call(pool, "block"))
+        await asyncio.sleep(0.1)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+
+    run(test)
+    assert devices.cancelled.wait(1)
+
+
+def test_dead_worker_is_started_again(devices):
+    async def test(pool):
+        await call(pool)
+        dead = pool._workers[0]
+        task = asyncio.ensure_future(call(pool, "block"))
+        await asyncio.sleep(0.1)
+        # The worker exits on its own, as a crashed one would.
+        dead.conn.send((worker.STOP,))
+        with pytest.raises(DeviceException):
+            await task
+        # Its reply to the request may come before its pipe closes.
+        for _ in range(50):
+            if dead.exited:
+                break
+            await asyncio.sleep(0.02)
+        assert dead.exited
+        await call(pool)
+        return pool._workers[0] is not dead
+
+    assert run(test)
+
+
+def test_stop_resolves_pending_requests(devices):
+    async def test(pool):
+        task = asyncio.ensure_future(call(pool, "block"))
+        await asyncio.sleep(0.1)
+        await pool.async_stop()
+        with pytest.raises(DeviceException, match="worker exited"):
+            await task
+
+    run(test)